@@ -0,0 +1,339 @@
+"""
+音訊處理工具：解碼、重新取樣、語音活動偵測 (VAD)、長音訊切段與編碼
+"""
+import io
+import math
+import wave
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import av
+import numpy as np
+
+# VAD 參數
+VAD_FRAME_MS = 30
+VAD_ABSOLUTE_THRESHOLD_DB = -50.0  # 低於此能量一律視為靜音
+VAD_SPEECH_THRESHOLD_DB = -35.0  # 高於此能量一律視為有聲（整段都是語音時噪音估計會偏高）
+VAD_NOISE_MARGIN_DB = 10.0  # 高於背景噪音多少 dB 視為有聲
+VAD_ZCR_THRESHOLD = 0.25  # 低能量但高過零率的幀視為清音（如擦音）
+VAD_HANGOVER_MS = 300  # 語音前後保留的緩衝長度
+VAD_MIN_SPEECH_MS = 200  # 語音總長度低於此值視為沒有說話
+
+
+@dataclass
+class SpeechAnalysis:
+    """VAD 分析結果"""
+    has_speech: bool
+    duration: float
+    speech_start: float = 0.0
+    speech_end: float = 0.0
+
+
+def decode_audio(content: bytes, target_rate: Optional[int] = None) -> Tuple[np.ndarray, int]:
+    """
+    將任意容器格式的音訊解碼為單聲道 float32 PCM
+
+    Args:
+        target_rate: 指定時在解碼過程中直接降取樣（長音訊用來節省記憶體），否則保留原始取樣率；
+            兩種情況都在逐幀解碼時混成單聲道，不會先保留所有聲道
+
+    Returns:
+        (samples, sample_rate)，samples 範圍為 [-1, 1]
+    """
+    with av.open(io.BytesIO(content), mode="r") as container:
+        stream = container.streams.audio[0]
+        sample_rate = stream.codec_context.sample_rate
+        if target_rate:
+            resampler = av.AudioResampler(format="fltp", layout="mono", rate=target_rate)
+            sample_rate = target_rate
+        else:
+            # 統一轉成單聲道 float planar，取樣率維持不變
+            resampler = av.AudioResampler(format="fltp", layout="mono")
+        chunks = []
+        for frame in container.decode(stream):
+            for resampled in resampler.resample(frame):
+                chunks.append(resampled.to_ndarray())
+        for resampled in resampler.resample(None):
+            chunks.append(resampled.to_ndarray())
+
+    if not chunks:
+        return np.zeros(0, dtype=np.float32), sample_rate
+
+    # 每個片段都是 (1, samples)
+    return np.concatenate(chunks, axis=1)[0].astype(np.float32, copy=False), sample_rate
+
+
+def frame_energy_db(samples: np.ndarray, sample_rate: int) -> np.ndarray:
+    """
+    計算每幀能量 (dBFS)
+    """
+    frame_length = max(1, int(sample_rate * VAD_FRAME_MS / 1000))
+    frame_count = len(samples) // frame_length
+    frames = samples[:frame_count * frame_length].reshape(frame_count, frame_length)
+    return 10.0 * np.log10(np.mean(frames * frames, axis=1) + 1e-12)
+
+
+def speech_mask(samples: np.ndarray, sample_rate: int) -> np.ndarray:
+    """
+    以能量與過零率判斷每一幀是否為語音（全程向量化）
+
+    Returns:
+        每幀一個布林值的陣列
+    """
+    frame_length = max(1, int(sample_rate * VAD_FRAME_MS / 1000))
+    frame_count = len(samples) // frame_length
+    if frame_count == 0:
+        return np.zeros(0, dtype=bool)
+
+    frames = samples[:frame_count * frame_length].reshape(frame_count, frame_length)
+
+    # 每幀能量 (dBFS) 與過零率
+    energy = np.mean(frames * frames, axis=1)
+    energy_db = 10.0 * np.log10(energy + 1e-12)
+    signs = np.signbit(frames)
+    zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / frame_length
+
+    # 以低百分位數估計背景噪音，門檻介於絕對靜音門檻與語音門檻之間
+    noise_floor = np.percentile(energy_db, 10)
+    threshold = max(
+        min(noise_floor + VAD_NOISE_MARGIN_DB, VAD_SPEECH_THRESHOLD_DB),
+        VAD_ABSOLUTE_THRESHOLD_DB
+    )
+
+    voiced = energy_db > threshold
+    unvoiced = (
+        (energy_db > threshold - VAD_NOISE_MARGIN_DB / 2)
+        & (energy_db > VAD_ABSOLUTE_THRESHOLD_DB)
+        & (zcr > VAD_ZCR_THRESHOLD)
+    )
+    return voiced | unvoiced
+
+
+def dilate_mask(mask: np.ndarray, frames: int) -> np.ndarray:
+    """
+    將語音遮罩前後各延伸指定幀數
+    """
+    kernel = np.ones(2 * frames + 1, dtype=np.int32)
+    return np.convolve(mask.astype(np.int32), kernel, mode="same") > 0
+
+
+def analyze_speech(samples: np.ndarray, sample_rate: int) -> SpeechAnalysis:
+    """
+    分析 PCM 是否含有語音，並找出語音的起訖時間
+    """
+    duration = len(samples) / sample_rate if sample_rate else 0.0
+    mask = speech_mask(samples, sample_rate)
+    if np.count_nonzero(mask) * VAD_FRAME_MS < VAD_MIN_SPEECH_MS:
+        return SpeechAnalysis(has_speech=False, duration=duration)
+
+    # 前後延伸 hangover，避免切掉字首字尾
+    padded = dilate_mask(mask, max(1, VAD_HANGOVER_MS // VAD_FRAME_MS))
+    speech_frames = np.flatnonzero(padded)
+    frame_seconds = VAD_FRAME_MS / 1000
+    return SpeechAnalysis(
+        has_speech=True,
+        duration=duration,
+        speech_start=speech_frames[0] * frame_seconds,
+        speech_end=min(duration, (speech_frames[-1] + 1) * frame_seconds)
+    )
+
+
+def find_split_points(
+    samples: np.ndarray,
+    sample_rate: int,
+    target_seconds: float,
+    max_seconds: float,
+    search_seconds: float = 15.0
+) -> List[Tuple[int, int]]:
+    """
+    在接近目標長度的位置尋找最安靜的幀作為切點，將長音訊切成多段
+
+    切點在「目標位置 ± search_seconds」內以平滑後能量最低的幀為準，避免切在字詞中間；
+    search_seconds 最多為 target_seconds 的一半，每段至少 target_seconds - search_seconds。
+    若照常切段後剩下的長度不足，最後兩段改為在剩餘部分的中點附近平分，因此最後一段與其他段
+    長度相近；max_seconds 只作為每段的硬性上限。
+
+    Returns:
+        [(start_sample, end_sample), ...]
+    """
+    total = len(samples)
+    search_seconds = min(search_seconds, target_seconds / 2)
+    split_limit = int(min(target_seconds + search_seconds, max_seconds) * sample_rate)
+    if total <= split_limit:
+        return [(0, total)]
+
+    energy_db = frame_energy_db(samples, sample_rate)
+    # 以約 0.3 秒的移動平均平滑能量，找的是停頓而不是單一安靜幀
+    smooth_frames = max(1, 300 // VAD_FRAME_MS)
+    smoothed = np.convolve(energy_db, np.ones(smooth_frames) / smooth_frames, mode="same")
+    frame_length = max(1, int(sample_rate * VAD_FRAME_MS / 1000))
+
+    def quietest_cut(low: int, high: int) -> int:
+        # 在 [low, high] 樣本範圍內找最安靜的幀邊界，範圍不足一幀時取中點
+        low_frame = -(-low // frame_length)
+        high_frame = min(high // frame_length, len(smoothed))
+        if high_frame <= low_frame:
+            return (low + high) // 2
+        return (low_frame + int(np.argmin(smoothed[low_frame:high_frame]))) * frame_length
+
+    min_length = int((target_seconds - search_seconds) * sample_rate)
+    search = int(search_seconds * sample_rate)
+    max_length = int(max_seconds * sample_rate)
+
+    chunks = []
+    start = 0
+    while total - start > split_limit:
+        cut = quietest_cut(start + min_length, start + split_limit)
+        remaining = total - start
+        if total - cut < min_length:
+            # 剩下的部分太短，改在剩餘部分的中點附近切成長度相近的兩段
+            middle = start + remaining // 2
+            width = max(0, min(search, remaining // 4, max_length - (remaining - remaining // 2)))
+            cut = quietest_cut(middle - width, middle + width)
+            chunks.append((start, cut))
+            start = cut
+            break
+        chunks.append((start, cut))
+        start = cut
+    chunks.append((start, total))
+    return chunks
+
+
+RESAMPLE_HALF_TAPS = 16  # 每個相位在中心兩側各取的輸入樣本數
+RESAMPLE_KAISER_BETA = 5.0
+RESAMPLE_BLOCK_SIZE = 65536  # 每次向量化計算的輸出樣本數，限制暫存記憶體
+
+
+def resample_poly(samples: np.ndarray, orig_rate: int, target_rate: int) -> np.ndarray:
+    """
+    以多相 (polyphase) FIR 濾波器重新取樣（升取樣 L、低通、降取樣 M）
+
+    濾波器依 L 個相位拆開，每個輸出樣本只與對應相位的係數做內積，
+    不需要真的插入零值；輸出以區塊為單位向量化計算。
+    """
+    if orig_rate == target_rate or len(samples) == 0:
+        return samples.astype(np.float32, copy=False)
+
+    divisor = math.gcd(orig_rate, target_rate)
+    up = target_rate // divisor
+    down = orig_rate // divisor
+
+    # Kaiser 窗 sinc 低通濾波器，截止頻率為兩個取樣率中較低者的 Nyquist
+    max_rate = max(up, down)
+    num_taps = 2 * RESAMPLE_HALF_TAPS * max_rate + 1
+    cutoff = 1.0 / max_rate
+    t = np.arange(num_taps) - (num_taps - 1) / 2
+    taps = cutoff * np.sinc(cutoff * t) * np.kaiser(num_taps, RESAMPLE_KAISER_BETA) * up
+
+    # polyphase[p, j] = taps[p + j * up]
+    taps_per_phase = -(-num_taps // up)
+    taps = np.pad(taps, (0, taps_per_phase * up - num_taps))
+    polyphase = taps.reshape(taps_per_phase, up).T.astype(np.float32)
+
+    delay = (num_taps - 1) // 2
+    pad = taps_per_phase + delay // up + 1
+    padded = np.concatenate([
+        np.zeros(pad, dtype=np.float32),
+        samples.astype(np.float32, copy=False),
+        np.zeros(pad, dtype=np.float32)
+    ])
+
+    output_length = -(-len(samples) * up // down)
+    output = np.empty(output_length, dtype=np.float32)
+    tap_offsets = np.arange(taps_per_phase)
+    for block_start in range(0, output_length, RESAMPLE_BLOCK_SIZE):
+        n = np.arange(block_start, min(block_start + RESAMPLE_BLOCK_SIZE, output_length))
+        position = n * down + delay  # 在升取樣序列中對應濾波器中心的位置
+        phase = position % up
+        base = position // up
+        indices = base[:, None] - tap_offsets[None, :] + pad
+        output[block_start:block_start + len(n)] = np.einsum(
+            "ij,ij->i", polyphase[phase], padded[indices]
+        )
+    return output
+
+
+def encode_wav(samples: np.ndarray, sample_rate: int) -> bytes:
+    """
+    將單聲道 float32 PCM 編碼為 16-bit WAV
+    """
+    pcm16 = (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(pcm16.tobytes())
+    return buffer.getvalue()
+
+
+def detect_and_trim(content: bytes, trim: bool = False) -> Tuple[SpeechAnalysis, Optional[bytes]]:
+    """
+    解碼音訊並執行 VAD；trim 為 True 時回傳去除前後靜音的 WAV
+
+    Returns:
+        (分析結果, 裁切後的 WAV 或 None)
+    """
+    samples, sample_rate = decode_audio(content)
+    analysis = analyze_speech(samples, sample_rate)
+    if not trim or not analysis.has_speech:
+        return analysis, None
+
+    start = int(analysis.speech_start * sample_rate)
+    end = int(analysis.speech_end * sample_rate)
+    # 只有裁掉足夠多的靜音才值得重新編碼
+    if (start + len(samples) - end) < sample_rate:
+        return analysis, None
+    return analysis, encode_wav(samples[start:end], sample_rate)
+
+
+# 壓縮編碼格式：(容器格式, 編碼器, 副檔名)
+COMPACT_FORMATS = {
+    "flac": ("flac", "flac", ".flac"),
+    "opus": ("ogg", "libopus", ".ogg")
+}
+
+
+def encode_compact(samples: np.ndarray, sample_rate: int, codec: str = "flac") -> Tuple[bytes, str]:
+    """
+    將單聲道 PCM 編碼為較精簡的格式（flac 無損、opus 有損；wav 則不壓縮）
+
+    Returns:
+        (編碼後內容, 副檔名)
+    """
+    if codec not in COMPACT_FORMATS:
+        return encode_wav(samples, sample_rate), ".wav"
+
+    container_format, codec_name, suffix = COMPACT_FORMATS[codec]
+    pcm16 = (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16)
+    buffer = io.BytesIO()
+    # bitexact：Ogg 預設使用隨機串流序號，相同音訊每次編碼結果不同會讓轉錄快取與請求合併失效
+    with av.open(buffer, mode="w", format=container_format, options={"fflags": "+bitexact"}) as container:
+        stream = container.add_stream(codec_name, rate=sample_rate, layout="mono")
+        frame = av.AudioFrame.from_ndarray(pcm16.reshape(1, -1), format="s16", layout="mono")
+        frame.sample_rate = sample_rate
+        for packet in stream.encode(frame):
+            container.mux(packet)
+        for packet in stream.encode(None):
+            container.mux(packet)
+    return buffer.getvalue(), suffix
+
+
+def is_pcm_wav(content: bytes) -> bool:
+    """
+    是否為未壓縮的 WAV；只有這類檔案前處理後才明顯變小（已壓縮的 opus/mp3 重新編碼成 FLAC 反而變大）
+    """
+    return len(content) >= 12 and content[:4] == b"RIFF" and content[8:12] == b"WAVE"
+
+
+def preprocess_audio(content: bytes, target_rate: int = 16000, codec: str = "flac") -> Tuple[bytes, str, float]:
+    """
+    解碼、混成單聲道、以多相濾波器重新取樣到 target_rate，再重新編碼
+
+    Returns:
+        (編碼後內容, 副檔名, 音訊秒數)
+    """
+    samples, sample_rate = decode_audio(content)
+    resampled = resample_poly(samples, sample_rate, target_rate)
+    encoded, suffix = encode_compact(resampled, target_rate, codec)
+    return encoded, suffix, len(resampled) / target_rate
@@ -0,0 +1,3 @@
+"""
+後端基準測試工具
+"""
@@ -0,0 +1,151 @@
+"""
+基準測試用的本機假上游：模擬 OpenAI Whisper 與 Gemini（REST）API，並可作為追蹤資料收集器
+
+延遲、抖動與錯誤率可調整，讓量測只反映本服務自身的成本，不呼叫付費 API。
+
+用法：
+    python -m bench.fake_upstreams --port 9100 --whisper-latency 0.8 --gemini-latency 1.5
+"""
+import argparse
+import asyncio
+import random
+from typing import Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+FAKE_TRANSCRIPT = "今天的會議主要討論新產品的上市時程。行銷團隊會在下週提出推廣方案。研發團隊需要在月底前完成測試。"
+FAKE_MERMAID = """```mermaid
+graph TD
+    A[產品上市] --> B[行銷推廣]
+    A --> C[研發測試]
+    B --> D[推廣方案]
+    C --> E[月底完成]
+    classDef highlight fill:#e3f2fd,stroke:#1976d2,stroke-width:3px;
+    class A highlight;
+```"""
+
+# 錯誤類型對應的 HTTP 狀態碼與訊息
+ERROR_RESPONSES = {
+    "rate_limit": (429, "Rate limit exceeded"),
+    "server": (500, "Internal server error"),
+    "unavailable": (503, "Service unavailable")
+}
+
+
+class UpstreamProfile:
+    """
+    單一假上游的延遲、抖動與錯誤設定
+    """
+
+    def __init__(self, latency: float, jitter: float, error_rate: float, error_type: str):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_type = error_type
+        self.requests = 0
+        self.errors = 0
+
+    async def simulate(self) -> Optional[JSONResponse]:
+        """
+        等待模擬延遲；依錯誤率回傳錯誤回應，成功時回傳 None
+        """
+        self.requests += 1
+        await asyncio.sleep(max(0.0, random.gauss(self.latency, self.jitter)))
+        if random.random() < self.error_rate:
+            self.errors += 1
+            status, message = ERROR_RESPONSES[self.error_type]
+            return JSONResponse(
+                status_code=status,
+                content={"error": {"code": status, "message": message, "status": self.error_type.upper()}}
+            )
+        return None
+
+    def stats(self) -> dict:
+        return {"requests": self.requests, "errors": self.errors}
+
+
+def create_app(whisper: UpstreamProfile, gemini: UpstreamProfile) -> FastAPI:
+    app = FastAPI(title="Fake upstreams")
+    collected_spans = []
+
+    @app.post("/v1/audio/transcriptions")
+    async def transcriptions(request: Request):
+        form = await request.form()
+        upload = form.get("file")
+        if upload is not None:
+            await upload.read()
+        error = await whisper.simulate()
+        if error is not None:
+            return error
+
+        if form.get("response_format") == "text":
+            return PlainTextResponse(FAKE_TRANSCRIPT)
+        return {
+            "task": "transcribe",
+            "language": "chinese",
+            "duration": 10.0,
+            "text": FAKE_TRANSCRIPT,
+            "segments": [
+                {"id": index, "seek": 0, "start": index * 3.0, "end": index * 3.0 + 3.0, "text": sentence + "。"}
+                for index, sentence in enumerate(filter(None, FAKE_TRANSCRIPT.split("。")))
+            ]
+        }
+
+    @app.post("/v1beta/models/{model}:generateContent")
+    async def generate_content(model: str, request: Request):
+        await request.body()
+        error = await gemini.simulate()
+        if error is not None:
+            return error
+        return {
+            "candidates": [{
+                "content": {"parts": [{"text": FAKE_MERMAID}], "role": "model"},
+                "finishReason": "STOP",
+                "index": 0
+            }],
+            "usageMetadata": {"promptTokenCount": 200, "candidatesTokenCount": 80, "totalTokenCount": 280}
+        }
+
+    @app.post("/v1beta/models/{model}:countTokens")
+    async def count_tokens(model: str):
+        return {"totalTokens": 1}
+
+    @app.post("/v1/traces")
+    async def collect_traces(request: Request):
+        # 追蹤收集器替身：保留最近的 span 供 /traces 查詢
+        payload = await request.json()
+        collected_spans.extend(payload.get("spans", []))
+        del collected_spans[:-10000]
+        return {"accepted": len(payload.get("spans", []))}
+
+    @app.get("/traces")
+    async def list_traces(trace_id: Optional[str] = None):
+        return [span for span in collected_spans if trace_id is None or span.get("trace_id") == trace_id]
+
+    @app.get("/stats")
+    async def stats():
+        return {"whisper": whisper.stats(), "gemini": gemini.stats(), "spans": len(collected_spans)}
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="本機假 Whisper / Gemini 伺服器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    for name, latency in (("whisper", 0.8), ("gemini", 1.5)):
+        parser.add_argument(f"--{name}-latency", type=float, default=latency, help="平均延遲（秒）")
+        parser.add_argument(f"--{name}-jitter", type=float, default=latency / 4, help="延遲標準差（秒）")
+        parser.add_argument(f"--{name}-error-rate", type=float, default=0.0, help="錯誤比例（0~1）")
+        parser.add_argument(f"--{name}-error-type", choices=list(ERROR_RESPONSES), default="server")
+    args = parser.parse_args()
+
+    whisper = UpstreamProfile(args.whisper_latency, args.whisper_jitter, args.whisper_error_rate, args.whisper_error_type)
+    gemini = UpstreamProfile(args.gemini_latency, args.gemini_jitter, args.gemini_error_rate, args.gemini_error_type)
+    uvicorn.run(create_app(whisper, gemini), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
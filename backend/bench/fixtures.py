@@ -0,0 +1,65 @@
+"""
+基準測試用的合成音訊：以諧波與音節包絡模擬語音，讓 VAD 判定為有語音
+"""
+import io
+import struct
+import wave
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+
+def synth_speech(seconds: float, sample_rate: int = SAMPLE_RATE, seed: int = 0) -> np.ndarray:
+    """
+    產生類語音訊號：基頻緩慢變化的諧波，加上每秒約 4 個音節的振幅包絡與少量雜訊
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    pitch = 140 + 30 * np.sin(2 * np.pi * 0.7 * t + rng.uniform(0, np.pi))
+    phase = 2 * np.pi * np.cumsum(pitch) / sample_rate
+    voice = sum(np.sin(harmonic * phase) / harmonic for harmonic in range(1, 6))
+    syllables = np.clip(np.sin(2 * np.pi * 4 * t + rng.uniform(0, np.pi)), 0, None) ** 0.5
+    # 每 3 秒留 0.5 秒停頓，讓長音訊切段時有靜音可切
+    pauses = (t % 3.0) < 2.5
+    signal = 0.3 * voice * syllables * pauses + 0.003 * rng.standard_normal(len(t))
+    return signal.astype(np.float32)
+
+
+def wav_bytes(samples: np.ndarray, sample_rate: int = SAMPLE_RATE) -> bytes:
+    """
+    編碼為 16-bit 單聲道 WAV
+    """
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(pcm)
+    return buffer.getvalue()
+
+
+def tag_wav(content: bytes, tag: str) -> bytes:
+    """
+    在 WAV 後附加 LIST/INFO 區塊寫入標記，讓相同音訊的每個請求內容都不同，
+    避免轉錄快取與請求合併使量測失真；解碼器會略過此區塊
+    """
+    text = tag.encode("utf-8") + b"\0"
+    info = b"INFO" + b"ICMT" + struct.pack("<I", len(text)) + text + b"\0" * (len(text) % 2)
+    content += b"LIST" + struct.pack("<I", len(info)) + info
+    # 更新 RIFF 標頭中的總長度
+    return content[:4] + struct.pack("<I", len(content) - 8) + content[8:]
+
+
+class AudioFixture:
+    """
+    預先合成並編碼一段音訊，每次取用時只附加不同的標記
+    """
+
+    def __init__(self, seconds: float, seed: int = 0):
+        self.seconds = seconds
+        self.content = wav_bytes(synth_speech(seconds, seed=seed))
+
+    def payload(self, tag: str) -> bytes:
+        return tag_wav(self.content, tag)
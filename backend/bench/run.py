@@ -0,0 +1,251 @@
+"""
+端點基準測試：啟動假上游與後端服務，以不同並行度壓測並回報延遲百分位、吞吐量與記憶體
+
+用法（在 backend 目錄下執行）：
+    python -m bench.run --concurrency 1 4 16 --requests 100
+    python -m bench.run --endpoints transcribe-realtime --whisper-latency 0.3 --output results.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+from bench.fixtures import AudioFixture
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RSS_SAMPLE_INTERVAL = 0.1
+MINDMAP_TEXT = "今天的會議主要討論新產品的上市時程，行銷團隊會在下週提出推廣方案，研發團隊需要在月底前完成測試。"
+
+
+def read_rss(pid: int) -> int:
+    """
+    讀取行程的常駐記憶體（位元組），僅支援 Linux /proc
+    """
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except FileNotFoundError:
+        pass
+    return 0
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+class Endpoint:
+    """
+    一個受測端點：名稱與產生單一請求的函式
+    """
+
+    def __init__(self, name: str, send: Callable[[httpx.AsyncClient, str], Any]):
+        self.name = name
+        self.send = send
+
+
+def build_endpoints(transcribe_fixture: AudioFixture, realtime_fixture: AudioFixture) -> Dict[str, Endpoint]:
+    # 每個請求附加唯一標記，避免快取命中與請求合併
+    async def transcribe(client: httpx.AsyncClient, tag: str):
+        files = {"file": ("bench.wav", transcribe_fixture.payload(tag), "audio/wav")}
+        return await client.post("/transcribe", files=files)
+
+    async def transcribe_realtime(client: httpx.AsyncClient, tag: str):
+        files = {"file": ("bench.wav", realtime_fixture.payload(tag), "audio/wav")}
+        return await client.post("/transcribe-realtime", files=files)
+
+    async def generate_mindmap(client: httpx.AsyncClient, tag: str):
+        return await client.post("/generate-mindmap", json={"text": f"{MINDMAP_TEXT}{tag}", "model": "gemini-1.5-flash"})
+
+    return {
+        "transcribe": Endpoint("transcribe", transcribe),
+        "transcribe-realtime": Endpoint("transcribe-realtime", transcribe_realtime),
+        "generate-mindmap": Endpoint("generate-mindmap", generate_mindmap)
+    }
+
+
+async def run_level(
+    client: httpx.AsyncClient,
+    endpoint: Endpoint,
+    concurrency: int,
+    total_requests: int,
+    server_pid: int
+) -> Dict[str, Any]:
+    """
+    以固定並行度送出 total_requests 個請求，期間持續取樣後端 RSS
+    """
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    remaining = iter(range(total_requests))
+    peak_rss = read_rss(server_pid)
+    sampling = True
+
+    async def sample_rss():
+        nonlocal peak_rss
+        while sampling:
+            peak_rss = max(peak_rss, read_rss(server_pid))
+            await asyncio.sleep(RSS_SAMPLE_INTERVAL)
+
+    async def worker():
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                response = await endpoint.send(client, uuid.uuid4().hex)
+                if response.status_code >= 400:
+                    errors[str(response.status_code)] = errors.get(str(response.status_code), 0) + 1
+                    continue
+            except httpx.HTTPError as e:
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    sampler = asyncio.create_task(sample_rss())
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    sampling = False
+    await sampler
+
+    return {
+        "endpoint": endpoint.name,
+        "concurrency": concurrency,
+        "requests": total_requests,
+        "succeeded": len(latencies),
+        "errors": errors,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "throughput": len(latencies) / elapsed if elapsed > 0 else 0.0,
+        "peak_rss_mb": peak_rss / (1024 * 1024)
+    }
+
+
+def start_process(args: List[str], env: Optional[Dict[str, str]] = None) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, *args], cwd=BACKEND_DIR, env=env)
+
+
+async def wait_until_ready(url: str, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                response = await client.get(url)
+                if response.status_code < 500:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"等待 {url} 就緒逾時")
+
+
+def print_table(results: List[Dict[str, Any]]) -> None:
+    header = f"{'endpoint':<22}{'conc':>6}{'ok':>7}{'err':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>9}{'RSS MB':>9}"
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        print(
+            f"{result['endpoint']:<22}{result['concurrency']:>6}{result['succeeded']:>7}"
+            f"{sum(result['errors'].values()):>6}"
+            f"{result['p50'] * 1000:>10.1f}{result['p95'] * 1000:>10.1f}{result['p99'] * 1000:>10.1f}"
+            f"{result['throughput']:>9.2f}{result['peak_rss_mb']:>9.1f}"
+        )
+
+
+async def run(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    upstream_url = f"http://127.0.0.1:{args.upstream_port}"
+    upstream = start_process([
+        "-m", "bench.fake_upstreams",
+        "--port", str(args.upstream_port),
+        "--whisper-latency", str(args.whisper_latency),
+        "--whisper-jitter", str(args.whisper_jitter),
+        "--whisper-error-rate", str(args.whisper_error_rate),
+        "--gemini-latency", str(args.gemini_latency),
+        "--gemini-jitter", str(args.gemini_jitter),
+        "--gemini-error-rate", str(args.gemini_error_rate)
+    ])
+
+    server_env = {
+        **os.environ,
+        "OPENAI_API_KEY": "bench",
+        "OPENAI_BASE_URL": f"{upstream_url}/v1",
+        "GEMINI_API_KEY": "bench",
+        "GEMINI_API_ENDPOINT": upstream_url,
+        "GEMINI_TRANSPORT": "rest"
+    }
+    server = start_process(
+        ["-m", "uvicorn", "main:app", "--port", str(args.port), "--log-level", "warning"],
+        env=server_env
+    )
+
+    try:
+        await wait_until_ready(f"{upstream_url}/stats")
+        await wait_until_ready(f"http://127.0.0.1:{args.port}/health")
+
+        endpoints = build_endpoints(
+            AudioFixture(args.transcribe_seconds, seed=1),
+            AudioFixture(args.realtime_seconds, seed=2)
+        )
+        results = []
+        limits = httpx.Limits(max_connections=max(args.concurrency))
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{args.port}", limits=limits, timeout=args.timeout
+        ) as client:
+            for name in args.endpoints:
+                for concurrency in args.concurrency:
+                    result = await run_level(client, endpoints[name], concurrency, args.requests, server.pid)
+                    results.append(result)
+                    print_table([result])
+        return results
+    finally:
+        for process in (server, upstream):
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="後端端點基準測試（使用本機假上游）")
+    parser.add_argument("--endpoints", nargs="+", default=["transcribe", "transcribe-realtime", "generate-mindmap"],
+                        choices=["transcribe", "transcribe-realtime", "generate-mindmap"])
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 16, 64])
+    parser.add_argument("--requests", type=int, default=100, help="每個並行度送出的請求數")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--upstream-port", type=int, default=9100)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--transcribe-seconds", type=float, default=30.0, help="/transcribe 測試音訊長度")
+    parser.add_argument("--realtime-seconds", type=float, default=3.0, help="/transcribe-realtime 測試音訊長度")
+    parser.add_argument("--whisper-latency", type=float, default=0.8)
+    parser.add_argument("--whisper-jitter", type=float, default=0.2)
+    parser.add_argument("--whisper-error-rate", type=float, default=0.0)
+    parser.add_argument("--gemini-latency", type=float, default=1.5)
+    parser.add_argument("--gemini-jitter", type=float, default=0.4)
+    parser.add_argument("--gemini-error-rate", type=float, default=0.0)
+    parser.add_argument("--output", help="將結果寫入 JSON 檔案")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print()
+    print_table(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(results, output, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+"""
+快取工具：以音訊內容雜湊為鍵的轉錄結果快取、以正規化文字為鍵的 TTL 快取，
+以及合併相同鍵並行請求的 single-flight
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import aiofiles
+
+logger = logging.getLogger(__name__)
+
+DISK_PRUNE_LOW_WATER = 0.9  # 磁碟層超過上限時刪到上限的 90%，避免之後每次寫入都再掃描一次目錄
+
+
+class TranscriptCache:
+    """
+    轉錄結果快取（記憶體 LRU + 可選的磁碟層）
+
+    鍵為「音訊位元組 + 模型 + 語言 + 回應格式」的 SHA-256，
+    記憶體層以序列化後的位元組數作為容量預算。
+    """
+
+    def __init__(self, max_bytes: int, disk_dir: Optional[str] = None, disk_max_bytes: int = 0):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.entries: "OrderedDict[str, Tuple[Any, int]]" = OrderedDict()
+        self.current_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.disk_bytes = 0
+        self.pruning = False
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self.disk_bytes = sum(size for _, size, _ in self._disk_files())
+
+    @staticmethod
+    def make_key(content: bytes, model: str, language: str, response_format: str) -> str:
+        digest = hashlib.sha256(content)
+        digest.update(f"\0{model}\0{language}\0{response_format}".encode("utf-8"))
+        return digest.hexdigest()
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _store(self, key: str, value: Any, size: int) -> None:
+        if size > self.max_bytes:
+            return
+        if key in self.entries:
+            self.current_bytes -= self.entries.pop(key)[1]
+        self.entries[key] = (value, size)
+        self.current_bytes += size
+        while self.current_bytes > self.max_bytes:
+            _, (_, evicted_size) = self.entries.popitem(last=False)
+            self.current_bytes -= evicted_size
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+        if self.disk_dir:
+            try:
+                async with aiofiles.open(self._disk_path(key), "r", encoding="utf-8") as cache_file:
+                    serialized = await cache_file.read()
+                value = json.loads(serialized)
+                self._store(key, value, len(serialized.encode("utf-8")))
+                self.disk_hits += 1
+                return value
+            except FileNotFoundError:
+                pass
+            except ValueError as e:
+                # 損壞的項目刪除後視為未命中，之後重新轉錄時會再寫入
+                logger.warning(f"磁碟快取項目損壞，已刪除: {e}")
+                self.disk_bytes -= await asyncio.to_thread(self._remove_disk, self._disk_path(key))
+            except Exception as e:
+                logger.warning(f"讀取磁碟快取失敗: {e}")
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: Any) -> None:
+        serialized = json.dumps(value, ensure_ascii=False)
+        self._store(key, value, len(serialized.encode("utf-8")))
+
+        if self.disk_dir:
+            try:
+                self.disk_bytes += await asyncio.to_thread(self._write_disk, self._disk_path(key), serialized)
+                if self.disk_max_bytes > 0 and self.disk_bytes > self.disk_max_bytes and not self.pruning:
+                    # 掃描目錄可能有上萬個檔案，移到執行緒中進行，不阻塞事件迴圈
+                    self.pruning = True
+                    try:
+                        self.disk_bytes -= await asyncio.to_thread(self._prune_disk)
+                    finally:
+                        self.pruning = False
+            except Exception as e:
+                logger.warning(f"寫入磁碟快取失敗: {e}")
+
+    def _write_disk(self, path: str, serialized: str) -> int:
+        """
+        先寫入同目錄的暫存檔再以 os.replace 原子性地換上，讀取端不會看到寫到一半的內容
+
+        Returns:
+            磁碟層增加的位元組數（覆寫既有項目時扣掉舊檔大小）
+        """
+        data = serialized.encode("utf-8")
+        try:
+            previous_size = os.path.getsize(path)
+        except FileNotFoundError:
+            previous_size = 0
+        fd, temp_path = tempfile.mkstemp(dir=self.disk_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as temp_file:
+                temp_file.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        return len(data) - previous_size
+
+    @staticmethod
+    def _remove_disk(path: str) -> int:
+        try:
+            size = os.path.getsize(path)
+            os.unlink(path)
+        except FileNotFoundError:
+            return 0
+        return size
+
+    def _disk_files(self) -> list:
+        files = []
+        with os.scandir(self.disk_dir) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.endswith(".json"):
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+        return files
+
+    def _prune_disk(self) -> int:
+        """
+        磁碟層超過容量時，依修改時間刪除最舊的項目，直到低於容量的 DISK_PRUNE_LOW_WATER
+
+        Returns:
+            刪除的位元組數
+        """
+        files = self._disk_files()
+        total = sum(size for _, size, _ in files)
+        low_water = self.disk_max_bytes * DISK_PRUNE_LOW_WATER
+        freed = 0
+        for _, size, path in sorted(files):
+            if total - freed <= low_water:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            freed += size
+        return freed
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self.entries),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses
+        }
+
+
+def normalize_text(text: str) -> str:
+    """
+    正規化文字作為快取鍵：統一全半形、忽略大小寫，並移除空白與標點
+    """
+    normalized = unicodedata.normalize("NFKC", text).lower()
+    return "".join(
+        char for char in normalized
+        if not char.isspace() and not unicodedata.category(char).startswith("P")
+    )
+
+
+class TTLCache:
+    """
+    具過期時間與數量上限的記憶體快取，並記錄命中/未命中次數
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(*parts: str) -> str:
+        return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self.entries.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at > time.monotonic():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self.entries[key]
+        self.misses += 1
+        return None
+
+    def set(self, key: str, value: Any) -> None:
+        if key in self.entries:
+            del self.entries[key]
+        self.entries[key] = (value, time.monotonic() + self.ttl)
+        self._evict()
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        # 先清除最舊的過期項目，再依 LRU 淘汰超出上限的項目
+        while self.entries:
+            _, (_, expires_at) = next(iter(self.entries.items()))
+            if expires_at > now and len(self.entries) <= self.max_entries:
+                break
+            self.entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+class SingleFlight:
+    """
+    合併相同鍵的並行呼叫：同一時間只有一個上游請求，其餘呼叫者等待同一個結果
+
+    共用的工作以 asyncio.shield 等待，任一呼叫者取消（例如客戶端中斷連線）
+    不會取消其他仍在等待的呼叫者；工作完成後即移除，不保留結果（結果由快取負責）。
+    """
+
+    def __init__(self):
+        self.flights: Dict[str, "asyncio.Task[Any]"] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def run(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        self.calls += 1
+        task = self.flights.get(key)
+        if task is None:
+            task = asyncio.create_task(func())
+            self.flights[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: "asyncio.Task[Any]") -> None:
+        if self.flights.get(key) is task:
+            del self.flights[key]
+        # 所有呼叫者都已取消時仍取出例外，避免 "exception was never retrieved" 警告
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self.flights),
+            "calls": self.calls,
+            "coalesced": self.coalesced
+        }
@@ -0,0 +1,73 @@
+"""
+Gemini 模型註冊表：每個模型只建立一次 GenerativeModel 並重複使用
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+import google.generativeai as genai
+
+logger = logging.getLogger(__name__)
+
+
+class GeminiModelRegistry:
+    """
+    預先建立並快取各模型的 GenerativeModel 實例
+
+    啟動時 warm() 建立所有實例，並可選擇以 count_tokens 呼叫預先建立連線；
+    各模型的就緒狀態（pending / ready / error）提供給 /health 查詢。
+    """
+
+    def __init__(self, model_names: List[str], use_async: bool = True):
+        self.model_names = list(model_names)
+        self.use_async = use_async
+        self.models: Dict[str, Any] = {}
+        self.status: Dict[str, Dict[str, Any]] = {
+            name: {"state": "pending", "error": None, "warmed_at": None} for name in self.model_names
+        }
+
+    def get(self, name: str) -> Any:
+        """
+        取得模型實例；尚未建立時（例如暖機仍在進行）立即建立
+        """
+        model = self.models.get(name)
+        if model is None:
+            model = self._build(name)
+        return model
+
+    def _build(self, name: str) -> Any:
+        model = genai.GenerativeModel(name)
+        self.models[name] = model
+        return model
+
+    async def warm(self, ping: bool = False, timeout: float = 10.0) -> None:
+        """
+        建立所有模型實例；ping 為 True 時另外呼叫 count_tokens 建立上游連線
+        """
+        async def warm_model(name: str) -> None:
+            try:
+                model = self.get(name)
+                if ping:
+                    if self.use_async:
+                        request = model.count_tokens_async("ping")
+                    else:
+                        request = asyncio.to_thread(model.count_tokens, "ping")
+                    await asyncio.wait_for(request, timeout=timeout)
+                self.status[name] = {"state": "ready", "error": None, "warmed_at": time.time()}
+            except Exception as e:
+                logger.warning(f"Gemini 模型 {name} 暖機失敗: {e}")
+                # 實例已建立時仍可使用，請求時再由呼叫端處理錯誤
+                self.status[name] = {"state": "error", "error": str(e), "warmed_at": time.time()}
+
+        await asyncio.gather(*(warm_model(name) for name in self.model_names))
+
+    def ready(self, name: Optional[str] = None) -> bool:
+        names = [name] if name else self.model_names
+        return all(self.status.get(model, {}).get("state") == "ready" for model in names)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready(),
+            "models": {name: dict(status) for name, status in self.status.items()}
+        }
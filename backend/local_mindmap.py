@@ -0,0 +1,319 @@
+"""
+本機架構圖引擎：不呼叫 Gemini，以關鍵詞擷取在數毫秒內產生 Mermaid 架構圖
+
+流程：
+1. 依標點切句，中日韓文字以虛詞切成詞組並取 2~4 字的 n-gram，英文以單字為詞
+2. TF-IDF（以句子為文件）作為先驗權重，在句內共現圖上執行 TextRank（個人化 PageRank）
+3. 去除互相包含的重複詞組，取前幾名作為節點
+4. 排名最高者為根節點，其次為第一層，其餘依句內共現掛到最相關的第一層節點
+"""
+import math
+import re
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from caches import normalize_text
+
+MAX_NODES = 6  # 包括根節點
+MAX_FIRST_LEVEL = 3
+MAX_LABEL_LENGTH = 20
+MAX_CANDIDATES = 150  # 只把 TF-IDF 前幾名放進 TextRank 圖
+COOCCURRENCE_WINDOW = 3
+TEXTRANK_DAMPING = 0.85
+TEXTRANK_ITERATIONS = 30
+TEXTRANK_TOLERANCE = 1e-6
+SUBSUMPTION_RATIO = 0.8
+MIN_NGRAM = 2
+MAX_NGRAM = 4
+
+CJK = "㐀-䶿一-鿿豈-﫿"
+TOKEN_PATTERN = re.compile(rf"[{CJK}]+|[A-Za-z][A-Za-z0-9'\-]*")
+SENTENCE_PATTERN = re.compile(r"[。！？!?；;\n]+|(?<=[^\d])[.](?=\s|$)")
+
+# 常見虛詞與代名詞（簡繁皆列），用來切開中文詞組
+STOP_CHARS = set(
+    "的了是在和與与及或也就都而且但並并被把給给讓让從从向對对於于為为以之其此這这那"
+    "我你您他她它們们咱沒没不很更最太再又還还只才已將将著着"
+    "嗎吗呢吧啊呀哦喔嗯呃啦哈欸個个些每各某若則则"
+)
+STOP_WORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "can", "do", "for", "from", "has", "have",
+    "i", "if", "in", "is", "it", "its", "of", "on", "or", "so", "that", "the", "their", "then", "there",
+    "these", "they", "this", "to", "was", "we", "were", "what", "when", "which", "will", "with", "you",
+    "我們", "我们", "你們", "你们", "他們", "他们", "這個", "这个", "那個", "那个", "什麼", "什么",
+    "然後", "然后", "所以", "因為", "因为", "但是", "可以", "就是", "還有", "还有", "一下", "一些",
+    "今天", "現在", "现在", "這樣", "这样", "那樣", "那样", "如果", "已經", "已经", "應該", "应该",
+    "大家", "其實", "其实", "比較", "比较", "非常", "而且", "或者", "以及", "目前", "時候", "时候",
+    "需要", "必須", "必须", "主要", "包含", "進行", "进行", "提出", "透過", "通過", "通过", "開始", "开始",
+    "一個", "一个", "可能", "不是", "沒有", "没有", "覺得", "觉得", "知道", "這些", "这些", "那些", "一直",
+    "之後", "之后", "之前", "以後", "以后", "會在", "会在", "要在"
+}
+
+
+@dataclass
+class MindmapNode:
+    id: str
+    label: str
+    parent: Optional[str]
+    score: float
+
+
+def split_sentences(text: str) -> List[str]:
+    return [sentence.strip() for sentence in SENTENCE_PATTERN.split(text) if sentence and sentence.strip()]
+
+
+def _cjk_phrases(run: str) -> List[str]:
+    """以虛詞把連續的中文字切成詞組"""
+    phrases = []
+    current = []
+    for char in run:
+        if char in STOP_CHARS:
+            if current:
+                phrases.append("".join(current))
+                current = []
+        else:
+            current.append(char)
+    if current:
+        phrases.append("".join(current))
+    return phrases
+
+
+def tokenize(sentence: str) -> Tuple[List[str], List[str]]:
+    """
+    取出句子中的候選詞
+
+    Returns:
+        (完整詞組：虛詞之間 2~4 字的中文或英文單字, 較長中文詞組拆出的 n-gram)
+    """
+    phrases: List[str] = []
+    grams: List[str] = []
+    for token in TOKEN_PATTERN.findall(sentence):
+        if token[0].isascii():
+            word = token.lower()
+            if len(word) >= 3 and word not in STOP_WORDS:
+                phrases.append(word)
+            continue
+        for phrase in _cjk_phrases(token):
+            if MIN_NGRAM <= len(phrase) <= MAX_NGRAM:
+                if phrase not in STOP_WORDS:
+                    phrases.append(phrase)
+            elif len(phrase) > MAX_NGRAM:
+                for size in range(MIN_NGRAM, MAX_NGRAM + 1):
+                    for start in range(len(phrase) - size + 1):
+                        gram = phrase[start:start + size]
+                        if gram not in STOP_WORDS:
+                            grams.append(gram)
+    return phrases, grams
+
+
+def _textrank(
+    sequences: List[List[str]],
+    candidates: List[str],
+    prior: Dict[str, float]
+) -> Dict[str, float]:
+    """
+    在句內共現圖上以 TF-IDF 為個人化向量執行 PageRank
+    """
+    index = {term: i for i, term in enumerate(candidates)}
+    neighbors: List[Dict[int, float]] = [defaultdict(float) for _ in candidates]
+    for sequence in sequences:
+        ids = [index[term] for term in sequence if term in index]
+        for position, source in enumerate(ids):
+            for target in ids[position + 1:position + 1 + COOCCURRENCE_WINDOW]:
+                if source != target:
+                    neighbors[source][target] += 1.0
+                    neighbors[target][source] += 1.0
+
+    total_prior = sum(prior[term] for term in candidates) or 1.0
+    personalization = [prior[term] / total_prior for term in candidates]
+    out_weight = [sum(edges.values()) for edges in neighbors]
+    scores = personalization[:]
+    for _ in range(TEXTRANK_ITERATIONS):
+        updated = [(1 - TEXTRANK_DAMPING) * p for p in personalization]
+        dangling = 0.0
+        for source, edges in enumerate(neighbors):
+            if not out_weight[source]:
+                dangling += scores[source]
+                continue
+            share = TEXTRANK_DAMPING * scores[source] / out_weight[source]
+            for target, weight in edges.items():
+                updated[target] += share * weight
+        # 沒有共現邊的詞依先驗權重分配，維持總和為 1
+        for i, p in enumerate(personalization):
+            updated[i] += TEXTRANK_DAMPING * dangling * p
+        delta = sum(abs(a - b) for a, b in zip(updated, scores))
+        scores = updated
+        if delta < TEXTRANK_TOLERANCE:
+            break
+    return {term: scores[i] for i, term in enumerate(candidates)}
+
+
+def extract_keyphrases(text: str, limit: int = MAX_NODES) -> Tuple[List[Tuple[str, float]], List[List[str]]]:
+    """
+    擷取關鍵詞組
+
+    Returns:
+        (依分數排序的 [(詞組, 分數)], 每個句子的候選詞序列)
+    """
+    sentences = split_sentences(text)
+    sequences: List[List[str]] = []
+    term_frequency: Counter = Counter()
+    document_frequency: Counter = Counter()
+    first_seen: Dict[str, int] = {}
+    from_phrase = set()
+
+    for sentence in sentences:
+        phrases, grams = tokenize(sentence)
+        sequence = phrases + grams
+        sequences.append(sequence)
+        term_frequency.update(sequence)
+        document_frequency.update(set(sequence))
+        from_phrase.update(phrases)
+        for term in sequence:
+            first_seen.setdefault(term, len(first_seen))
+
+    # n-gram 只出現一次多半是切錯的片段，完整詞組則保留
+    terms = [term for term in term_frequency if term in from_phrase or term_frequency[term] >= 2]
+    if not terms:
+        return [], sequences
+
+    sentence_count = len(sentences)
+    prior = {}
+    for term in terms:
+        idf = math.log((sentence_count + 1) / (document_frequency[term] + 1)) + 1
+        length_bonus = 1 + 0.15 * (min(len(term), MAX_NGRAM) - MIN_NGRAM) if not term.isascii() else 1.0
+        prior[term] = term_frequency[term] * idf * length_bonus
+
+    candidates = sorted(terms, key=lambda term: (-prior[term], first_seen[term]))[:MAX_CANDIDATES]
+    # 短詞幾乎都出現在某個長詞裡時（例如「推廣方」只出現在「推廣方案」中）改用長詞
+    candidates = [
+        term for term in candidates
+        if not any(
+            len(other) > len(term) and term in other
+            and term_frequency[other] >= SUBSUMPTION_RATIO * term_frequency[term]
+            for other in candidates
+        )
+    ]
+    scores = _textrank(sequences, candidates, prior)
+    ranked = sorted(candidates, key=lambda term: (-scores[term], first_seen[term]))
+
+    # 去除互相包含的詞組（例如「語音辨」與「語音辨識」只保留分數較高者）；
+    # 同一段文字滑動切出的 n-gram 互相重疊時（「即時音訊」與「音訊串流」）合併成原文中的完整詞組
+    selected: List[Tuple[str, float]] = []
+    for term in ranked:
+        if any(term in chosen or chosen in term for chosen, _ in selected):
+            continue
+        overlapped = False
+        for index, (chosen, score) in enumerate(selected):
+            merged = _merge_overlap(chosen, term)
+            if merged is None:
+                continue
+            overlapped = True
+            if merged in text and len(merged) <= MAX_LABEL_LENGTH:
+                selected[index] = (merged, score)
+            break
+        if overlapped:
+            continue
+        selected.append((term, scores[term]))
+        if len(selected) >= limit:
+            break
+    return _drop_contained(selected), sequences
+
+
+def _merge_overlap(a: str, b: str) -> Optional[str]:
+    """
+    兩個中文詞組首尾重疊時回傳合併後的詞組，否則回傳 None
+
+    至少需重疊 2 個字（其中一方只有 2 個字時重疊 1 個字即可），避免把偶然相鄰的字當成同一個詞
+    """
+    if a.isascii() or b.isascii():
+        return None
+    min_overlap = 1 if min(len(a), len(b)) <= 2 else 2
+    for size in range(min(len(a), len(b)) - 1, min_overlap - 1, -1):
+        if a[-size:] == b[:size]:
+            return a + b[size:]
+        if b[-size:] == a[:size]:
+            return b + a[size:]
+    return None
+
+
+def _drop_contained(selected: List[Tuple[str, float]]) -> List[Tuple[str, float]]:
+    """合併後的詞組可能與先前選入的詞組相同（只保留分數較高的第一個）或包含它們（只保留較長者）"""
+    unique = []
+    seen = set()
+    for term, score in selected:
+        key = normalize_text(term)
+        if key not in seen:
+            seen.add(key)
+            unique.append((term, score))
+    return [
+        (term, score) for term, score in unique
+        if not any(term != other and term in other for other, _ in unique)
+    ]
+
+
+def build_graph(text: str, max_nodes: int = MAX_NODES) -> List[MindmapNode]:
+    """
+    將關鍵詞組整理成最多 max_nodes 個節點的階層
+    """
+    keyphrases, sequences = extract_keyphrases(text, max_nodes)
+    if not keyphrases:
+        return []
+
+    node_ids = [chr(ord("A") + i) for i in range(len(keyphrases))]
+    nodes = [MindmapNode(id=node_ids[0], label=keyphrases[0][0], parent=None, score=keyphrases[0][1])]
+
+    first_level = list(range(1, min(len(keyphrases), 1 + MAX_FIRST_LEVEL)))
+    for i in first_level:
+        nodes.append(MindmapNode(id=node_ids[i], label=keyphrases[i][0], parent=node_ids[0], score=keyphrases[i][1]))
+
+    # 其餘節點掛到同句共現次數最多的第一層節點，沒有共現時掛在根節點
+    sentence_terms = [set(sequence) for sequence in sequences]
+
+    def cooccurrence(a: str, b: str) -> int:
+        return sum(1 for terms in sentence_terms if a in terms and b in terms)
+
+    for i in range(len(first_level) + 1, len(keyphrases)):
+        label, score = keyphrases[i]
+        best_parent, best_count = node_ids[0], 0
+        for j in first_level:
+            count = cooccurrence(label, keyphrases[j][0])
+            if count > best_count:
+                best_parent, best_count = node_ids[j], count
+        nodes.append(MindmapNode(id=node_ids[i], label=label, parent=best_parent, score=score))
+    return nodes
+
+
+def _escape_label(label: str) -> str:
+    if len(label) > MAX_LABEL_LENGTH:
+        label = label[:MAX_LABEL_LENGTH - 3] + "..."
+    return label.replace('"', "&quot;").replace("'", "&#39;").replace("\n", " ")
+
+
+def render_mermaid(nodes: List[MindmapNode]) -> str:
+    lines = ["graph TD"]
+    for node in nodes:
+        if node.parent is None:
+            lines.append(f'    {node.id}["{_escape_label(node.label)}"]')
+        else:
+            lines.append(f'    {node.parent} --> {node.id}["{_escape_label(node.label)}"]')
+    lines.append("    classDef default fill:#f9f9f9,stroke:#333,stroke-width:2px,font-size:14px;")
+    lines.append("    classDef highlight fill:#e3f2fd,stroke:#1976d2,stroke-width:3px;")
+    if nodes:
+        lines.append(f"    class {nodes[0].id} highlight;")
+    return "\n".join(lines)
+
+
+def generate_local_mindmap(text: str) -> Dict[str, str]:
+    """
+    產生與 Gemini 相同格式的架構圖；擷取不到關鍵詞時以原文開頭作為單一節點
+    """
+    nodes = build_graph(text)
+    if not nodes:
+        nodes = [MindmapNode(id="A", label=text.strip() or "語音轉錄內容", parent=None, score=0.0)]
+    return {
+        "type": "mermaid",
+        "mermaid_code": render_mermaid(nodes),
+        "tier": "local"
+    }
@@ -1,17 +1,35 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import FastAPI, File, Form, UploadFile, HTTPException, Query, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from contextlib import asynccontextmanager, contextmanager, nullcontext
+import httpx
 import openai
 import google.generativeai as genai
 import os
 from dotenv import load_dotenv
-import tempfile
+import asyncio
 import aiofiles
-from typing import Dict, Any, List
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple
 import logging
 import re
 import json
+import time
+import uuid
+from collections import OrderedDict
 from pydantic import BaseModel
+import audio_processing
+from caches import SingleFlight, TranscriptCache, TTLCache, normalize_text
+from uploads import UploadSizeLimitMiddleware, read_upload
+import zh_convert
+from realtime_sessions import RealtimeSession, RealtimeSessionStore, stitch_transcript
+from gemini_models import GeminiModelRegistry
+from transcription_backends import OpenAIWhisperBackend, TranscriptionBackend, local_backend_from_env
+from metrics import MetricsMiddleware, Registry
+import tracing
+from tracing import TracingMiddleware
+from mermaid_stream import MermaidLineBuffer
+from local_mindmap import generate_local_mindmap
+from mindmap_sessions import SessionMindmap, SessionMindmapStore, build_patch_prompt, local_patch, parse_patch
 
 # 載入環境變數
 load_dotenv()
@@ -28,20 +46,105 @@ class GeminiRequest(BaseModel):
 class ModelListResponse(BaseModel):
     models: List[str]
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """應用程式生命週期：啟動時預熱模型，關閉時釋放轉錄後端與共用的 HTTP 連線池"""
+    # 背景暖機，不延遲服務啟動；暖機完成前的請求會直接建立實例
+    warmup_task = asyncio.create_task(gemini_models.warm(ping=GEMINI_WARMUP_PING))
+    tracing.exporter.start()
+    # 本機轉錄模型在啟動時載入一次，之後所有請求共用
+    if TRANSCRIPTION_BACKEND == "local" or LOCAL_WHISPER_PRELOAD:
+        await transcription_backends["local"].load()
+    yield
+    warmup_task.cancel()
+    for backend in transcription_backends.values():
+        await backend.close()
+    await tracing.exporter.close()
+    await client.close()
+
 # 初始化 FastAPI 應用
 app = FastAPI(
     title="Speech-to-Text API",
     description="即時語音轉文字 API 服務",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
+)
+
+# 上傳大小限制
+TRANSCRIBE_MAX_BYTES = 25 * 1024 * 1024
+TRANSCRIBE_SIZE_ERROR = "檔案大小超過 25MB 限制"
+REALTIME_MAX_BYTES = 5 * 1024 * 1024  # 限制為 5MB 以確保即時性能
+REALTIME_SIZE_ERROR = "即時轉錄檔案大小限制為 5MB"
+LONG_AUDIO_MAX_BYTES = int(os.getenv("LONG_AUDIO_MAX_BYTES", str(500 * 1024 * 1024)))
+LONG_AUDIO_SIZE_ERROR = f"檔案大小超過 {LONG_AUDIO_MAX_BYTES // (1024 * 1024)}MB 限制"
+BATCH_MAX_BYTES = int(os.getenv("BATCH_MAX_BYTES", str(200 * 1024 * 1024)))
+BATCH_SIZE_ERROR = f"批次上傳總大小超過 {BATCH_MAX_BYTES // (1024 * 1024)}MB 限制"
+
+# Prometheus 指標：各階段耗時、進行中的請求、快取命中與上游錯誤
+metrics = Registry()
+STAGE_SECONDS = metrics.histogram(
+    "stt_stage_duration_seconds", "各處理階段耗時（upload / decode / whisper / mindmap）", ["stage"]
+)
+REQUEST_SECONDS = metrics.histogram(
+    "stt_request_duration_seconds", "端點完整請求耗時（total）", ["path", "status"]
+)
+REQUESTS_IN_FLIGHT = metrics.gauge("stt_requests_in_flight", "進行中的請求數", ["path"])
+UPSTREAM_IN_FLIGHT = metrics.gauge("stt_upstream_in_flight", "進行中的上游呼叫數", ["upstream"])
+UPSTREAM_ERRORS = metrics.counter("stt_upstream_errors_total", "上游呼叫錯誤數（依例外類型）", ["upstream", "type"])
+
+@contextmanager
+def traced_stage(name: str, **attributes: Any):
+    """同時記錄階段耗時指標與追蹤 span"""
+    with STAGE_SECONDS.labels(name).time(), tracing.span(name, **attributes) as stage_span:
+        yield stage_span
+
+metrics.callback(
+    "stt_cache_hits_total", "快取命中次數", "counter", ["cache", "tier"],
+    lambda: [
+        (("transcript", "memory"), transcript_cache.hits),
+        (("transcript", "disk"), transcript_cache.disk_hits),
+        (("mindmap", "memory"), mindmap_cache.hits)
+    ]
+)
+metrics.callback(
+    "stt_cache_misses_total", "快取未命中次數", "counter", ["cache"],
+    lambda: [(("transcript",), transcript_cache.misses), (("mindmap",), mindmap_cache.misses)]
+)
+metrics.callback(
+    "stt_coalesced_requests_total", "與進行中相同請求合併的次數", "counter", ["call"],
+    lambda: [(("whisper",), whisper_flight.coalesced), (("mindmap",), mindmap_flight.coalesced)]
+)
+
+# 在解析 multipart 之前就檢查請求大小，超過上限立即中止
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    limits={
+        # 超過 25MB 的檔案會改用長音訊模式切段轉錄
+        "/transcribe": (LONG_AUDIO_MAX_BYTES, LONG_AUDIO_SIZE_ERROR),
+        "/transcribe-realtime": (REALTIME_MAX_BYTES, REALTIME_SIZE_ERROR),
+        "/transcribe/batch": (BATCH_MAX_BYTES, BATCH_SIZE_ERROR)
+    }
+)
+
+# 指標中間件位於大小限制之外，被拒絕的上傳也計入請求時間
+app.add_middleware(
+    MetricsMiddleware,
+    paths=["/transcribe", "/transcribe-realtime", "/transcribe/batch", "/generate-mindmap", "/generate-mindmap/stream"],
+    in_flight=REQUESTS_IN_FLIGHT,
+    duration=REQUEST_SECONDS
 )
 
-# 設定 CORS 中間件
+# 追蹤中間件：每個請求一個根 span，回應標頭帶有 X-Trace-Id
+app.add_middleware(TracingMiddleware, exclude_paths=["/health", "/metrics"])
+
+# 設定 CORS 中間件（最後加入，位於最外層，錯誤回應也帶有 CORS 標頭）
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000", "http://localhost:5173", "http://localhost:5174"],  # React 開發伺服器
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Trace-Id", "traceparent"],
 )
 
 # 初始化 OpenAI 客戶端（僅用於 Whisper）
@@ -49,54 +152,296 @@ openai_api_key = os.getenv("OPENAI_API_KEY")
 if not openai_api_key:
     raise ValueError("OPENAI_API_KEY 環境變數未設定")
 
-client = openai.OpenAI(api_key=openai_api_key)
+# OpenAI 連線池設定（所有請求共用同一組 keep-alive 連線）
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20"))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "120"))
+
+# 使用非同步客戶端，避免 Whisper 呼叫阻塞事件迴圈
+client = openai.AsyncOpenAI(
+    api_key=openai_api_key,
+    http_client=httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS
+        ),
+        timeout=httpx.Timeout(OPENAI_TIMEOUT, connect=10.0)
+    )
+)
 
 # 初始化 Gemini 客戶端
 gemini_api_key = os.getenv("GEMINI_API_KEY")
 if not gemini_api_key:
     raise ValueError("GEMINI_API_KEY 環境變數未設定")
 
-genai.configure(api_key=gemini_api_key)
+# 可選：改用其他 Gemini 端點（例如基準測試用的本機假伺服器）
+# OpenAI SDK 會自行讀取 OPENAI_BASE_URL，不需額外設定
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT") or None
+GEMINI_TRANSPORT = os.getenv("GEMINI_TRANSPORT") or None  # grpc / rest
+
+genai.configure(
+    api_key=gemini_api_key,
+    transport=GEMINI_TRANSPORT,
+    client_options={"api_endpoint": GEMINI_API_ENDPOINT} if GEMINI_API_ENDPOINT else None
+)
 
 # 可用的 Gemini 模型
-AVAILABLE_MODELS = [
+GEMINI_MODELS = [
     "gemini-1.5-flash",
     "gemini-1.5-pro",
     "gemini-1.0-pro"
 ]
 
-def convert_to_traditional_chinese(text: str) -> str:
+# 本機關鍵詞架構圖引擎（不呼叫 Gemini，數毫秒內完成），與 Gemini 模型一起列在 /models
+LOCAL_MINDMAP_MODEL = "local"
+AVAILABLE_MODELS = GEMINI_MODELS + [LOCAL_MINDMAP_MODEL]
+
+# Gemini 並行控制：全域上限 + 每個模型各自的等待佇列，避免架構圖請求暴增時拖垮轉錄
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+GEMINI_PER_MODEL_CONCURRENCY = int(os.getenv("GEMINI_PER_MODEL_CONCURRENCY", "4"))
+GEMINI_MAX_QUEUE = int(os.getenv("GEMINI_MAX_QUEUE", "32"))
+GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "30"))
+
+gemini_semaphore = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+gemini_model_semaphores: Dict[str, asyncio.Semaphore] = {
+    model: asyncio.Semaphore(GEMINI_PER_MODEL_CONCURRENCY) for model in GEMINI_MODELS
+}
+gemini_model_waiting: Dict[str, int] = {model: 0 for model in GEMINI_MODELS}
+
+# 每個模型只建立一次 GenerativeModel，避免每次請求重複初始化
+GEMINI_WARMUP_PING = os.getenv("GEMINI_WARMUP_PING", "false").lower() == "true"
+gemini_models = GeminiModelRegistry(GEMINI_MODELS, use_async=GEMINI_TRANSPORT != "rest")
+
+@asynccontextmanager
+async def gemini_slot(model: str):
+    """
+    在全域與每個模型的並行上限內取得 Gemini 模型實例
+    """
+    model_semaphore = gemini_model_semaphores[model]
+    if gemini_model_waiting[model] >= GEMINI_MAX_QUEUE:
+        raise Exception(f"Gemini 模型 {model} 佇列已滿")
+
+    gemini_model_waiting[model] += 1
+    try:
+        await model_semaphore.acquire()
+    finally:
+        gemini_model_waiting[model] -= 1
+
+    try:
+        async with gemini_semaphore:
+            yield gemini_models.get(model)
+    finally:
+        model_semaphore.release()
+
+async def call_gemini(model: str, prompt: str) -> str:
     """
-    使用 OpenAI API 將簡體中文轉換為繁體中文
+    在並行上限內以非同步方式呼叫 Gemini，回傳生成的文字
     """
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {
-                    "role": "system", 
-                    "content": "你是一個語言轉換專家。請將用戶輸入的文字轉換為繁體中文，保持原意不變，只改變字體。如果輸入已經是繁體中文，則直接返回原文。請只返回轉換後的文字內容，不要包含任何解釋或提示。"
-                },
-                {
-                    "role": "user", 
-                    "content": text
-                }
-            ],
-            max_tokens=1000,
-            temperature=0.1
+        async with gemini_slot(model) as model_instance:
+            if GEMINI_TRANSPORT == "rest":
+                # 非同步客戶端只支援 gRPC，REST 傳輸改在執行緒中呼叫同步版本
+                request = asyncio.to_thread(model_instance.generate_content, prompt)
+            else:
+                request = model_instance.generate_content_async(prompt)
+            with UPSTREAM_IN_FLIGHT.labels("gemini").track_inprogress(), tracing.span("gemini", model=model):
+                response = await asyncio.wait_for(request, timeout=GEMINI_TIMEOUT)
+            return response.text
+    except Exception as e:
+        UPSTREAM_ERRORS.labels("gemini", type(e).__name__).inc()
+        raise
+
+async def stream_gemini(model: str, prompt: str) -> AsyncIterator[str]:
+    """
+    以串流方式呼叫 Gemini，逐段產出生成的文字；每段之間的等待受 GEMINI_TIMEOUT 限制
+    """
+    if GEMINI_TRANSPORT == "rest":
+        # REST 傳輸沒有非同步串流，整段生成後一次產出
+        yield await call_gemini(model, prompt)
+        return
+
+    try:
+        async with gemini_slot(model) as model_instance:
+            with UPSTREAM_IN_FLIGHT.labels("gemini").track_inprogress(), tracing.span("gemini", model=model, stream=True):
+                response = await asyncio.wait_for(
+                    model_instance.generate_content_async(prompt, stream=True),
+                    timeout=GEMINI_TIMEOUT
+                )
+                chunks = response.__aiter__()
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), timeout=GEMINI_TIMEOUT)
+                    except StopAsyncIteration:
+                        break
+                    if chunk.text:
+                        yield chunk.text
+    except Exception as e:
+        UPSTREAM_ERRORS.labels("gemini", type(e).__name__).inc()
+        raise
+
+WHISPER_MODEL = "whisper-1"
+WHISPER_LANGUAGE = "zh"  # 指定中文語言
+
+# 轉錄後端：openai（Whisper API）或 local（本機 CPU 推論，需安裝 faster-whisper）
+TRANSCRIPTION_BACKEND = os.getenv("TRANSCRIPTION_BACKEND", "openai")
+LOCAL_WHISPER_PRELOAD = os.getenv("LOCAL_WHISPER_PRELOAD", "false").lower() == "true"
+
+transcription_backends: Dict[str, TranscriptionBackend] = {
+    "openai": OpenAIWhisperBackend(client, WHISPER_MODEL),
+    "local": local_backend_from_env()
+}
+if TRANSCRIPTION_BACKEND not in transcription_backends:
+    raise ValueError(f"不支援的轉錄後端: {TRANSCRIPTION_BACKEND}")
+
+def get_transcription_backend(name: Optional[str] = None) -> TranscriptionBackend:
+    """
+    依名稱取得轉錄後端，未指定時使用 TRANSCRIPTION_BACKEND
+    """
+    backend = transcription_backends.get(name or TRANSCRIPTION_BACKEND)
+    if backend is None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"不支援的轉錄後端: {name}. 可用後端: {', '.join(transcription_backends)}"
+        )
+    if not backend.available:
+        # 本機後端是可選功能，未安裝 faster-whisper 時回報服務無法使用，而不是內部錯誤
+        raise HTTPException(
+            status_code=503,
+            detail=f"轉錄後端目前無法使用: {backend.name}（本機後端需要安裝 faster-whisper）"
         )
-        return response.choices[0].message.content.strip()
+    return backend
+
+# 轉錄結果快取：相同音訊重送時直接回傳先前的結果
+TRANSCRIPT_CACHE_MAX_BYTES = int(os.getenv("TRANSCRIPT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+TRANSCRIPT_CACHE_DIR = os.getenv("TRANSCRIPT_CACHE_DIR") or None
+TRANSCRIPT_CACHE_DISK_MAX_BYTES = int(os.getenv("TRANSCRIPT_CACHE_DISK_MAX_BYTES", str(1024 * 1024 * 1024)))
+
+transcript_cache = TranscriptCache(
+    max_bytes=TRANSCRIPT_CACHE_MAX_BYTES,
+    disk_dir=TRANSCRIPT_CACHE_DIR,
+    disk_max_bytes=TRANSCRIPT_CACHE_DISK_MAX_BYTES
+)
+whisper_flight = SingleFlight()
+
+async def whisper_transcribe(
+    content: bytes,
+    suffix: str,
+    response_format: str = "verbose_json",
+    use_cache: bool = True,
+    backend: Optional[str] = None,
+    preprocess: bool = False
+) -> Any:
+    """
+    以選定的轉錄後端（預設為 OpenAI Whisper API）進行語音轉文字
+
+    preprocess 為 True 時在送出前執行音訊前處理；快取鍵以原始內容計算，
+    重送相同檔案時直接命中快取，不必再解碼與重新編碼
+
+    Returns:
+        response_format 為 verbose_json 時回傳 dict，text 時回傳字串
+    """
+    transcription_backend = get_transcription_backend(backend)
+    cache_key = None
+    if use_cache:
+        cache_key = TranscriptCache.make_key(
+            content, transcription_backend.model_id, WHISPER_LANGUAGE, response_format
+        )
+        cached = await transcript_cache.get(cache_key)
+        if cached is not None:
+            logger.info("轉錄快取命中")
+            return cached
+
+    async def request_whisper() -> Any:
+        upload, upload_suffix = content, suffix
+        if preprocess:
+            upload, upload_suffix = await preprocess_audio(content, suffix)
+        try:
+            with UPSTREAM_IN_FLIGHT.labels("whisper").track_inprogress(), \
+                    traced_stage("whisper", backend=transcription_backend.name, bytes=len(upload)):
+                result = await transcription_backend.transcribe(upload, upload_suffix, response_format, WHISPER_LANGUAGE)
+        except Exception as e:
+            UPSTREAM_ERRORS.labels("whisper", type(e).__name__).inc()
+            raise
+        if cache_key is not None:
+            await transcript_cache.set(cache_key, result)
+        return result
+
+    if cache_key is None:
+        return await request_whisper()
+    # 相同音訊的並行請求（例如重複送出）共用同一次 Whisper 呼叫
+    return await whisper_flight.run(cache_key, request_whisper)
+
+# 語音活動偵測：靜音片段不送 Whisper
+VAD_ENABLED = os.getenv("VAD_ENABLED", "true").lower() == "true"
+VAD_TRIM_SILENCE = os.getenv("VAD_TRIM_SILENCE", "false").lower() == "true"
+
+async def detect_speech(content: bytes, suffix: str) -> Tuple[bool, bytes, str]:
+    """
+    在呼叫 Whisper 前解碼音訊並執行 VAD
+
+    Returns:
+        (是否偵測到語音, 要送出的音訊內容, 副檔名)；解碼失敗時視為有語音，交由 Whisper 處理
+    """
+    if not VAD_ENABLED:
+        return True, content, suffix
+
+    try:
+        with traced_stage("decode"):
+            analysis, trimmed = await asyncio.to_thread(
+                audio_processing.detect_and_trim, content, VAD_TRIM_SILENCE
+            )
+    except Exception as e:
+        logger.warning(f"音訊解碼或 VAD 失敗，直接送出原始音訊: {e}")
+        return True, content, suffix
+
+    if trimmed is not None:
+        return True, trimmed, ".wav"
+    return analysis.has_speech, content, suffix
+
+# 轉錄結果轉換為繁體中文（本地對照表，不需網路）
+CONVERT_TO_TRADITIONAL = os.getenv("CONVERT_TO_TRADITIONAL", "true").lower() == "true"
+
+def convert_to_traditional_chinese(text: str) -> str:
+    """
+    使用本地對照表將簡體中文轉換為繁體中文
+    """
+    if not CONVERT_TO_TRADITIONAL or not text:
+        return text
+    try:
+        return zh_convert.to_traditional(text)
     except Exception as e:
         logger.warning(f"繁體中文轉換失敗，返回原文: {e}")
         return text
 
-def generate_mindmap_data(text: str, model: str = "gemini-1.5-flash") -> Dict[str, Any]:
+# 架構圖快取：相同文字（忽略空白與標點）不重複呼叫 Gemini
+MINDMAP_CACHE_MAX_ENTRIES = int(os.getenv("MINDMAP_CACHE_MAX_ENTRIES", "1000"))
+MINDMAP_CACHE_TTL = float(os.getenv("MINDMAP_CACHE_TTL", "3600"))
+
+mindmap_cache = TTLCache(max_entries=MINDMAP_CACHE_MAX_ENTRIES, ttl=MINDMAP_CACHE_TTL)
+mindmap_flight = SingleFlight()
+
+async def generate_mindmap_data(text: str, model: str = "gemini-1.5-flash") -> Dict[str, Any]:
     """
-    使用 Gemini API 生成內容架構圖（Mermaid 流程圖格式）
+    使用 Gemini API 生成內容架構圖（Mermaid 流程圖格式）；model 為 local 時改用本機引擎
     """
-    try:
-        # 構建 Gemini 提示
-        prompt = f"""
+    if model == LOCAL_MINDMAP_MODEL:
+        with traced_stage("mindmap_local"):
+            return generate_local_mindmap(text)
+
+    cache_key = TTLCache.make_key(model, normalize_text(text))
+    cached = mindmap_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    # 相同文字的並行請求（例如多個分頁）共用同一次 Gemini 呼叫
+    with traced_stage("mindmap"):
+        return await mindmap_flight.run(cache_key, lambda: request_mindmap(text, model, cache_key))
+
+def build_mindmap_prompt(text: str) -> str:
+    """
+    構建 Gemini 提示
+    """
+    return f"""
 請根據以下文本內容，生成一個清晰的架構圖，使用 Mermaid 流程圖語法。
 
 文本內容：
@@ -125,26 +470,37 @@ graph TD
     class A highlight;
 """
 
+async def request_mindmap(text: str, model: str, cache_key: str) -> Dict[str, Any]:
+    """
+    呼叫 Gemini 生成架構圖，失敗時降級為靜態架構圖
+    """
+    try:
+        prompt = build_mindmap_prompt(text)
+
         # 使用 Gemini API 生成內容
-        model_instance = genai.GenerativeModel(model)
-        response = model_instance.generate_content(prompt)
+        response_text = await call_gemini(model, prompt)
         
-        if response.text:
-            mermaid_code = response.text.strip()
+        if response_text:
+            mermaid_code = response_text.strip()
             # 清理可能的 markdown 代碼塊標記
             mermaid_code = mermaid_code.replace('```mermaid', '').replace('```', '').strip()
             
-            return {
+            mindmap_data = {
                 "type": "mermaid",
-                "mermaid_code": mermaid_code
+                "mermaid_code": mermaid_code,
+                "tier": "gemini"
             }
+            # 只快取 Gemini 成功的結果，降級結果不快取
+            mindmap_cache.set(cache_key, mindmap_data)
+            return mindmap_data
         else:
             raise Exception("Gemini API 沒有返回內容")
         
     except Exception as e:
         logger.warning(f"Gemini 架構圖生成失敗: {e}")
         # 降級到簡單的靜態架構圖
-        return generate_fallback_mindmap(text)
+        with tracing.span("mindmap_fallback", reason=str(e)):
+            return generate_fallback_mindmap(text)
 
 def generate_fallback_mindmap(text: str) -> Dict[str, Any]:
     """
@@ -198,7 +554,8 @@ def generate_fallback_mindmap(text: str) -> Dict[str, Any]:
         
         return {
             "type": "mermaid",
-            "mermaid_code": diagram_content
+            "mermaid_code": diagram_content,
+            "tier": "fallback"
         }
         
     except Exception as e:
@@ -207,9 +564,180 @@ def generate_fallback_mindmap(text: str) -> Dict[str, Any]:
         clean_text = text[:20].replace('"', '&quot;').replace("'", "&#39;").replace('\n', '<br/>')
         return {
             "type": "mermaid",
-            "mermaid_code": f"graph TD\n    A[語音轉錄] --> B[\"{clean_text}...\"]\n    classDef default fill:#f9f9f9,stroke:#333,stroke-width:2px,font-size:14px;\n    classDef highlight fill:#e3f2fd,stroke:#1976d2,stroke-width:3px;\n    class A highlight;"
+            "mermaid_code": f"graph TD\n    A[語音轉錄] --> B[\"{clean_text}...\"]\n    classDef default fill:#f9f9f9,stroke:#333,stroke-width:2px,font-size:14px;\n    classDef highlight fill:#e3f2fd,stroke:#1976d2,stroke-width:3px;\n    class A highlight;",
+            "tier": "fallback"
         }
 
+# 背景架構圖任務：轉錄結果先回傳，架構圖完成後再由 /mindmap/{job_id} 取得
+MINDMAP_JOB_TTL = float(os.getenv("MINDMAP_JOB_TTL", "600"))
+MINDMAP_JOB_MAX = int(os.getenv("MINDMAP_JOB_MAX", "1000"))
+MINDMAP_MIN_TEXT_LENGTH = 20  # 只有足夠長的文字才生成架構圖
+
+mindmap_jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+mindmap_job_tasks: set = set()
+
+# 架構圖版本：同一範圍（即時工作階段或 WebSocket 連線）每個新片段遞增，
+# 較舊版本尚未完成的 Gemini 升級會被取消，完成得太晚的升級也會標記為 stale 而不回傳
+mindmap_scopes: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+def next_mindmap_version(scope: Optional[str], version: Optional[int] = None) -> Optional[int]:
+    """
+    取得範圍內的架構圖版本號，並作廢該範圍尚未完成的舊升級任務
+
+    version 指定時（例如依片段順序編號）直接使用；片段並行轉錄時可能晚於較新的片段完成，
+    此時版本已不是最新，回傳 None
+    """
+    if scope is None:
+        return version or 1
+    state = mindmap_scopes.pop(scope, None) or {"version": 0, "job_id": None}
+    mindmap_scopes[scope] = state
+    while len(mindmap_scopes) > MINDMAP_JOB_MAX:
+        mindmap_scopes.popitem(last=False)
+
+    if version is None:
+        version = state["version"] + 1
+    elif version <= state["version"]:
+        return None
+
+    previous = mindmap_jobs.get(state["job_id"]) if state["job_id"] else None
+    if previous is not None and previous["status"] == "pending":
+        mark_mindmap_job_stale(previous)
+        previous["task"].cancel()
+    state["version"] = version
+    state["job_id"] = None
+    return version
+
+def is_latest_mindmap_version(scope: Optional[str], version: int) -> bool:
+    state = mindmap_scopes.get(scope) if scope is not None else None
+    return state is None or state["version"] <= version
+
+def mark_mindmap_job_stale(job: Dict[str, Any]) -> None:
+    job["status"] = "stale"
+    job["mindmap"] = None
+    job["done_event"].set()
+
+def prune_mindmap_jobs() -> None:
+    """
+    清除過期或超出數量上限的架構圖任務
+    """
+    now = time.monotonic()
+    while mindmap_jobs:
+        job_id, job = next(iter(mindmap_jobs.items()))
+        if len(mindmap_jobs) > MINDMAP_JOB_MAX or now - job["created_at"] > MINDMAP_JOB_TTL:
+            mindmap_jobs.popitem(last=False)
+        else:
+            break
+
+async def run_mindmap_job(job_id: str, text: str, model: str) -> None:
+    """
+    在背景執行架構圖生成，並將結果寫回任務
+    """
+    job = mindmap_jobs.get(job_id)
+    try:
+        mindmap_data = await generate_mindmap_data(text, model)
+        if job is not None and job["status"] == "pending":
+            if not is_latest_mindmap_version(job["scope"], job["version"]):
+                mark_mindmap_job_stale(job)
+                return
+            job["status"] = "done"
+            job["mindmap"] = {**mindmap_data, "version": job["version"]}
+    except Exception as e:
+        logger.warning(f"背景架構圖任務失敗: {e}")
+        if job is not None:
+            job["status"] = "failed"
+            job["error"] = str(e)
+    finally:
+        if job is not None:
+            job["done_event"].set()
+
+def submit_mindmap_job(
+    text: str,
+    model: str = "gemini-1.5-flash",
+    scope: Optional[str] = None,
+    version: int = 1
+) -> str:
+    """
+    建立背景架構圖任務並回傳任務 ID
+
+    scope 與 version 用於分層架構圖：同一範圍內只保留最新版本的升級
+    """
+    prune_mindmap_jobs()
+    job_id = uuid.uuid4().hex
+    mindmap_jobs[job_id] = {
+        "status": "pending",
+        "model": model,
+        "scope": scope,
+        "version": version,
+        "mindmap": None,
+        "error": None,
+        "created_at": time.monotonic(),
+        "done_event": asyncio.Event()
+    }
+    task = asyncio.create_task(run_mindmap_job(job_id, text, model))
+    mindmap_jobs[job_id]["task"] = task
+    mindmap_job_tasks.add(task)
+    task.add_done_callback(mindmap_job_tasks.discard)
+    if scope in mindmap_scopes:
+        mindmap_scopes[scope]["job_id"] = job_id
+    return job_id
+
+def maybe_submit_mindmap_job(text: str, model: str = "gemini-1.5-flash") -> Optional[str]:
+    """
+    文字足夠長時才建立架構圖任務（可選，不影響主要轉譯）
+    """
+    try:
+        if len(text.strip()) > MINDMAP_MIN_TEXT_LENGTH:
+            return submit_mindmap_job(text, model)
+    except Exception as e:
+        logger.warning(f"架構圖任務建立失敗，但不影響轉譯: {e}")
+    return None
+
+# 即時轉錄使用的架構圖模型：設為 local 時直接在回應中附上本機架構圖，不建立 Gemini 任務
+REALTIME_MINDMAP_MODEL = os.getenv("REALTIME_MINDMAP_MODEL", "gemini-1.5-flash")
+if REALTIME_MINDMAP_MODEL not in AVAILABLE_MODELS:
+    logger.warning(f"未知的 REALTIME_MINDMAP_MODEL: {REALTIME_MINDMAP_MODEL}，改用 gemini-1.5-flash")
+    REALTIME_MINDMAP_MODEL = "gemini-1.5-flash"
+# 分層架構圖：使用 Gemini 時也先在回應中附上本機架構圖，Gemini 架構圖完成後以相同版本號升級
+REALTIME_MINDMAP_TIERED = os.getenv("REALTIME_MINDMAP_TIERED", "true").lower() == "true"
+
+def realtime_mindmap(
+    text: str,
+    scope: Optional[str] = None,
+    version: Optional[int] = None
+) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """
+    即時片段的架構圖
+
+    Args:
+        text: 轉錄文字
+        scope: 版本範圍（工作階段或連線 ID），新片段會作廢同一範圍內較舊的升級
+        version: 指定版本號（依片段順序）；未指定時依呼叫順序遞增
+
+    Returns:
+        (立即可用的本機架構圖, Gemini 升級任務 ID)
+    """
+    if len(text.strip()) <= MINDMAP_MIN_TEXT_LENGTH:
+        return None, None
+    version = next_mindmap_version(scope, version)
+    if version is None:
+        return None, None  # 已有較新片段的架構圖
+
+    mindmap = None
+    if REALTIME_MINDMAP_MODEL == LOCAL_MINDMAP_MODEL or REALTIME_MINDMAP_TIERED:
+        try:
+            with traced_stage("mindmap_local"):
+                mindmap = {**generate_local_mindmap(text), "version": version}
+        except Exception as e:
+            logger.warning(f"本機架構圖生成失敗，但不影響轉譯: {e}")
+
+    mindmap_job_id = None
+    if REALTIME_MINDMAP_MODEL != LOCAL_MINDMAP_MODEL:
+        try:
+            mindmap_job_id = submit_mindmap_job(text, REALTIME_MINDMAP_MODEL, scope, version)
+        except Exception as e:
+            logger.warning(f"架構圖任務建立失敗，但不影響轉譯: {e}")
+    return mindmap, mindmap_job_id
+
 @app.get("/")
 async def root():
     """根路徑健康檢查"""
@@ -218,12 +746,35 @@ async def root():
 @app.get("/health")
 async def health_check():
     """健康檢查端點"""
-    return {"status": "healthy", "service": "speech-to-text-api"}
+    return {
+        "status": "healthy",
+        "service": "speech-to-text-api",
+        "caches": {
+            "transcript": transcript_cache.stats(),
+            "mindmap": mindmap_cache.stats()
+        },
+        "single_flight": {
+            "whisper": whisper_flight.stats(),
+            "mindmap": mindmap_flight.stats()
+        },
+        "gemini_models": gemini_models.stats(),
+        "mindmap_sessions": mindmap_sessions.stats(),
+        "tracing": tracing.exporter.stats(),
+        "transcription_backends": {
+            "default": TRANSCRIPTION_BACKEND,
+            **{name: backend.stats() for name, backend in transcription_backends.items()}
+        }
+    }
+
+@app.get("/metrics")
+async def metrics_endpoint() -> PlainTextResponse:
+    """Prometheus 格式的服務指標"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 @app.get("/models")
 async def get_available_models() -> ModelListResponse:
     """
-    獲取可用的 Gemini 模型列表
+    獲取可用的架構圖模型列表（Gemini 模型與本機引擎 local）
     """
     return ModelListResponse(models=AVAILABLE_MODELS)
 
@@ -239,7 +790,7 @@ async def generate_mindmap_endpoint(request: GeminiRequest) -> Dict[str, Any]:
                 detail=f"不支援的模型: {request.model}. 可用模型: {', '.join(AVAILABLE_MODELS)}"
             )
         
-        mindmap_data = generate_mindmap_data(request.text, request.model)
+        mindmap_data = await generate_mindmap_data(request.text, request.model)
         
         return {
             "success": True,
@@ -254,8 +805,306 @@ async def generate_mindmap_endpoint(request: GeminiRequest) -> Dict[str, Any]:
             detail=f"架構圖生成失敗: {str(e)}"
         )
 
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def stream_mindmap_events(text: str, model: str) -> AsyncIterator[str]:
+    """
+    產生架構圖的 SSE 事件：每收到一行 Mermaid 就送出 line 事件，最後送出含完整結果的 done 事件
+    """
+    if model == LOCAL_MINDMAP_MODEL:
+        mindmap_data = await generate_mindmap_data(text, model)
+        for line in mindmap_data["mermaid_code"].split("\n"):
+            yield sse_event("line", {"line": line})
+        yield sse_event("done", {"mindmap": mindmap_data, "source": "local"})
+        return
+
+    cache_key = TTLCache.make_key(model, normalize_text(text))
+    cached = mindmap_cache.get(cache_key)
+    if cached is not None:
+        for line in cached["mermaid_code"].split("\n"):
+            yield sse_event("line", {"line": line})
+        yield sse_event("done", {"mindmap": cached, "source": "cache"})
+        return
+
+    buffer = MermaidLineBuffer()
+    try:
+        with traced_stage("mindmap", stream=True):
+            async for chunk in stream_gemini(model, build_mindmap_prompt(text)):
+                for line in buffer.feed(chunk):
+                    yield sse_event("line", {"line": line})
+            for line in buffer.flush():
+                yield sse_event("line", {"line": line})
+        if not buffer.text:
+            raise Exception("Gemini API 沒有返回內容")
+    except Exception as e:
+        logger.warning(f"Gemini 串流架構圖生成失敗: {e}")
+        # 已送出的部分行作廢，改送降級架構圖
+        with tracing.span("mindmap_fallback", reason=str(e)):
+            fallback = generate_fallback_mindmap(text)
+        yield sse_event("reset", {"reason": str(e)})
+        for line in fallback["mermaid_code"].split("\n"):
+            yield sse_event("line", {"line": line})
+        yield sse_event("done", {"mindmap": fallback, "source": "fallback"})
+        return
+
+    mindmap_data = {"type": "mermaid", "mermaid_code": buffer.text, "tier": "gemini"}
+    mindmap_cache.set(cache_key, mindmap_data)
+    yield sse_event("done", {"mindmap": mindmap_data, "source": "gemini"})
+
+@app.post("/generate-mindmap/stream")
+async def generate_mindmap_stream(request: GeminiRequest) -> StreamingResponse:
+    """
+    以 Server-Sent Events 串流架構圖：Gemini 邊生成邊送出 Mermaid 行，前端可提早開始繪製
+
+    事件：line（一行 Mermaid）、reset（Gemini 失敗，清除已收到的行）、done（完整結果與來源）
+    """
+    if request.model not in AVAILABLE_MODELS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"不支援的模型: {request.model}. 可用模型: {', '.join(AVAILABLE_MODELS)}"
+        )
+
+    return StreamingResponse(
+        stream_mindmap_events(request.text, request.model),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/mindmap/{job_id}")
+async def get_mindmap_job(
+    job_id: str,
+    wait: float = Query(0, ge=0, le=30, description="最多等待秒數（長輪詢）")
+) -> Dict[str, Any]:
+    """
+    查詢背景架構圖任務的狀態與結果
+    """
+    job = mindmap_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"找不到架構圖任務: {job_id}"
+        )
+
+    if job["status"] == "pending" and wait > 0:
+        try:
+            await asyncio.wait_for(job["done_event"].wait(), timeout=wait)
+        except asyncio.TimeoutError:
+            pass
+
+    return {
+        "success": job["status"] != "failed",
+        "job_id": job_id,
+        "status": job["status"],
+        "model_used": job["model"],
+        "version": job["version"],
+        "mindmap": job["mindmap"],
+        "error": job["error"]
+    }
+
+@app.get("/mindmap/session/{session_id}")
+async def get_session_mindmap(
+    session_id: str,
+    since: int = Query(0, ge=0, description="客戶端目前的架構圖版本，只回傳之後的修補"),
+    wait: float = Query(0, ge=0, le=30, description="沒有新修補時最多等待秒數（長輪詢）")
+) -> Dict[str, Any]:
+    """
+    取得即時工作階段架構圖的增量修補
+
+    修補紀錄已不完整（客戶端版本太舊）時改回傳 snapshot，客戶端以完整節點圖取代本地狀態
+    """
+    graph = mindmap_sessions.get(session_id)
+    if graph is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"找不到工作階段架構圖: {session_id}"
+        )
+
+    if graph.version <= since and graph.refining and wait > 0:
+        try:
+            await asyncio.wait_for(graph.updated.wait(), timeout=wait)
+        except asyncio.TimeoutError:
+            pass
+
+    patches = graph.patches_since(since)
+    return {
+        "success": True,
+        "session_id": session_id,
+        "version": graph.version,
+        "pending": graph.refining,
+        "patches": patches or [],
+        "snapshot": graph.snapshot() if patches is None else None
+    }
+
+# 支援的音訊類型
+ALLOWED_AUDIO_TYPES = [
+    "audio/mpeg", "audio/mp4", "audio/wav", "audio/webm",
+    "audio/m4a", "audio/mpga", "audio/x-wav"
+]
+ALLOWED_AUDIO_EXTENSIONS = {"mp3", "mp4", "mpeg", "mpga", "m4a", "wav", "webm"}
+
+# 長音訊模式：解碼後在靜音處切段，平行轉錄再合併
+LONG_AUDIO_SAMPLE_RATE = 16000
+LONG_AUDIO_CHUNK_SECONDS = float(os.getenv("LONG_AUDIO_CHUNK_SECONDS", "180"))
+LONG_AUDIO_CONCURRENCY = int(os.getenv("LONG_AUDIO_CONCURRENCY", "12"))
+# 以未壓縮的 16-bit 單聲道 WAV 估算，每段需低於 Whisper 25MB 上限（保留 1MB 餘裕）
+LONG_AUDIO_MAX_CHUNK_SECONDS = (TRANSCRIBE_MAX_BYTES - 1024 * 1024) / (LONG_AUDIO_SAMPLE_RATE * 2)
+
+def join_transcript_texts(texts: List[str]) -> str:
+    """
+    合併多段轉錄文字；中文之間不加空白，其他語言以空白分隔
+    """
+    merged = ""
+    for text in texts:
+        text = text.strip()
+        if not text:
+            continue
+        if merged and not ("\u4e00" <= merged[-1] <= "\u9fff" or "\u4e00" <= text[0] <= "\u9fff"):
+            merged += " "
+        merged += text
+    return merged
+
+async def transcribe_long_audio(
+    content: bytes,
+    backend: Optional[str] = None,
+    semaphore: Optional[asyncio.Semaphore] = None
+) -> Dict[str, Any]:
+    """
+    將長音訊切段平行轉錄，合併文字並修正各片段的時間偏移
+
+    semaphore 為呼叫端共用的上游並行上限（例如批次轉錄），未指定時每個請求最多 LONG_AUDIO_CONCURRENCY 段並行
+    """
+    with traced_stage("decode"):
+        samples, sample_rate = await asyncio.to_thread(
+            audio_processing.decode_audio, content, LONG_AUDIO_SAMPLE_RATE
+        )
+    chunk_seconds = min(LONG_AUDIO_CHUNK_SECONDS, LONG_AUDIO_MAX_CHUNK_SECONDS)
+    bounds = await asyncio.to_thread(
+        audio_processing.find_split_points,
+        samples, sample_rate, chunk_seconds, LONG_AUDIO_MAX_CHUNK_SECONDS
+    )
+    logger.info(f"長音訊切成 {len(bounds)} 段進行平行轉錄")
+
+    semaphore = semaphore or asyncio.Semaphore(LONG_AUDIO_CONCURRENCY)
+
+    async def transcribe_chunk(start: int, end: int) -> Dict[str, Any]:
+        async with semaphore:
+            chunk, suffix = await asyncio.to_thread(
+                audio_processing.encode_compact, samples[start:end], sample_rate, AUDIO_PREPROCESS_CODEC
+            )
+            return await whisper_transcribe(chunk, suffix=suffix, response_format="verbose_json", backend=backend)
+
+    tasks = [asyncio.create_task(transcribe_chunk(start, end)) for start, end in bounds]
+    try:
+        transcripts = await asyncio.gather(*tasks)
+    finally:
+        # 任一片段失敗時整個請求已經失敗，取消其餘片段避免繼續呼叫上游
+        for task in tasks:
+            task.cancel()
+
+    segments = []
+    for (start, _), transcript in zip(bounds, transcripts):
+        offset = start / sample_rate
+        for segment in transcript.get("segments") or []:
+            segments.append({
+                **segment,
+                "id": len(segments),
+                "start": segment.get("start", 0) + offset,
+                "end": segment.get("end", 0) + offset
+            })
+
+    return {
+        "text": join_transcript_texts([transcript["text"] for transcript in transcripts]),
+        "language": transcripts[0].get("language") if transcripts else None,
+        "duration": len(samples) / sample_rate,
+        "segments": segments,
+        "chunks": len(bounds)
+    }
+
+# 上傳前的音訊前處理：未壓縮的 WAV 混成單聲道、降取樣到 16kHz 並重新編碼，縮小上傳量
+AUDIO_PREPROCESS = os.getenv("AUDIO_PREPROCESS", "true").lower() == "true"
+AUDIO_PREPROCESS_SAMPLE_RATE = 16000
+AUDIO_PREPROCESS_CODEC = os.getenv("AUDIO_PREPROCESS_CODEC", "flac")  # flac / opus / wav
+
+async def preprocess_audio(content: bytes, suffix: str) -> Tuple[bytes, str]:
+    """
+    前處理音訊；只有在結果比原始檔案小時才採用，失敗時沿用原始檔案
+    """
+    try:
+        with traced_stage("decode"):
+            processed, processed_suffix, duration = await asyncio.to_thread(
+                audio_processing.preprocess_audio, content, AUDIO_PREPROCESS_SAMPLE_RATE, AUDIO_PREPROCESS_CODEC
+            )
+    except Exception as e:
+        logger.warning(f"音訊前處理失敗，使用原始檔案: {e}")
+        return content, suffix
+
+    if len(processed) >= len(content):
+        return content, suffix
+    logger.info(f"音訊前處理: {len(content)} -> {len(processed)} bytes ({duration:.1f} 秒)")
+    return processed, processed_suffix
+
+async def transcribe_file_content(
+    content: bytes,
+    filename: str,
+    with_mindmap: bool = True,
+    long_audio: bool = False,
+    preprocess: bool = AUDIO_PREPROCESS,
+    backend: Optional[str] = None,
+    upstream: Optional[asyncio.Semaphore] = None
+) -> Dict[str, Any]:
+    """
+    轉錄完整音訊檔案，回傳含時間軸片段的結果；超過 25MB 時自動切段轉錄
+
+    upstream 為呼叫端共用的上游並行上限，短檔案的轉錄與長音訊的每一段都在其中執行
+    """
+    suffix = f".{filename.split('.')[-1]}"
+
+    if long_audio or len(content) > TRANSCRIBE_MAX_BYTES:
+        # 長音訊解碼時已降取樣並以精簡格式編碼各段，不另外前處理
+        transcript = await transcribe_long_audio(content, backend, upstream)
+    else:
+        # 使用選定的轉錄後端進行語音轉文字；只有未壓縮的 WAV 值得前處理
+        async with upstream or nullcontext():
+            transcript = await whisper_transcribe(
+                content,
+                suffix=suffix,
+                response_format="verbose_json",
+                backend=backend,
+                preprocess=preprocess and audio_processing.is_pcm_wav(content)
+            )
+    
+    # 轉換為繁體中文，保留原始轉譯結果
+    original_text = transcript["text"]
+    with tracing.span("convert"):
+        transcribed_text = convert_to_traditional_chinese(original_text)
+        segments = [
+            {**segment, "text": convert_to_traditional_chinese(segment.get("text", ""))}
+            for segment in transcript.get("segments") or []
+        ]
+    
+    # 架構圖改為背景任務（使用 Gemini），轉錄結果立即回傳
+    mindmap_job_id = maybe_submit_mindmap_job(transcribed_text) if with_mindmap else None
+    
+    return {
+        "success": True,
+        "text": transcribed_text,
+        "original_text": original_text,
+        "language": transcript.get("language"),
+        "duration": transcript.get("duration"),
+        "segments": segments,
+        "chunks": transcript.get("chunks", 1),
+        "mindmap": None,
+        "mindmap_job_id": mindmap_job_id
+    }
+
 @app.post("/transcribe")
-async def transcribe_audio(file: UploadFile = File(...)) -> Dict[str, Any]:
+async def transcribe_audio(
+    file: UploadFile = File(...),
+    long_audio: bool = Query(False, description="強制使用長音訊切段模式"),
+    preprocess: bool = Query(AUDIO_PREPROCESS, description="WAV 上傳前混成單聲道並降取樣到 16kHz"),
+    backend: Optional[str] = Query(None, description="轉錄後端：openai 或 local，預設依伺服器設定")
+) -> Dict[str, Any]:
     """
     語音轉文字端點
     
@@ -265,70 +1114,31 @@ async def transcribe_audio(file: UploadFile = File(...)) -> Dict[str, Any]:
     Returns:
         Dict containing transcribed text and metadata
     """
+    # FastAPI 在進入端點前已解析完 multipart，補記這段時間
+    tracing.record_span("multipart_parse", tracing.request_start())
     try:
         # 檢查檔案類型
-        allowed_types = [
-            "audio/mpeg", "audio/mp4", "audio/wav", "audio/webm",
-            "audio/m4a", "audio/mpga", "audio/x-wav"
-        ]
-        
-        if file.content_type not in allowed_types:
+        if file.content_type not in ALLOWED_AUDIO_TYPES:
             raise HTTPException(
                 status_code=400,
-                detail=f"不支援的檔案類型: {file.content_type}. 支援的類型: {', '.join(allowed_types)}"
+                detail=f"不支援的檔案類型: {file.content_type}. 支援的類型: {', '.join(ALLOWED_AUDIO_TYPES)}"
             )
         
-        # 檢查檔案大小 (25MB 限制)
-        content = await file.read()
-        if len(content) > 25 * 1024 * 1024:
-            raise HTTPException(
-                status_code=400,
-                detail="檔案大小超過 25MB 限制"
-            )
+        get_transcription_backend(backend)
+
+        # 檢查檔案大小，分塊讀取並在超過時立即中止；超過 25MB 的檔案改用長音訊模式
+        with traced_stage("upload"):
+            content = await read_upload(file, LONG_AUDIO_MAX_BYTES, LONG_AUDIO_SIZE_ERROR)
         
-        # 創建臨時檔案
-        with tempfile.NamedTemporaryFile(delete=False, suffix=f".{file.filename.split('.')[-1]}") as temp_file:
-            temp_file.write(content)
-            temp_file_path = temp_file.name
+        result = await transcribe_file_content(
+            content, file.filename, long_audio=long_audio, preprocess=preprocess, backend=backend
+        )
         
-        try:
-            # 使用 OpenAI Whisper API 進行語音轉文字
-            with open(temp_file_path, "rb") as audio_file:
-                transcript = client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio_file,
-                    response_format="verbose_json",
-                    language="zh"  # 指定中文語言
-                )
-            
-            # 直接使用原始轉譯結果，不強制轉換
-            transcribed_text = transcript.text
-            
-            # 生成架構圖數據（使用 Gemini，可選，不影響主要轉譯）
-            mindmap_data = None
-            try:
-                if len(transcribed_text.strip()) > 20:  # 只有足夠長的文字才生成架構圖
-                    mindmap_data = generate_mindmap_data(transcribed_text, "gemini-1.5-flash")
-            except Exception as e:
-                logger.warning(f"架構圖生成失敗，但不影響轉譯: {e}")
-            
-            result = {
-                "success": True,
-                "text": transcribed_text,
-                "language": transcript.language,
-                "duration": transcript.duration,
-                "segments": transcript.segments if hasattr(transcript, 'segments') else [],
-                "mindmap": mindmap_data
-            }
-            
-            logger.info(f"成功轉錄音訊檔案: {file.filename}")
-            return result
-            
-        finally:
-            # 清理臨時檔案
-            if os.path.exists(temp_file_path):
-                os.unlink(temp_file_path)
+        logger.info(f"成功轉錄音訊檔案: {file.filename}")
+        return result
                 
+    except HTTPException:
+        raise
     except openai.APIError as e:
         logger.error(f"OpenAI API 錯誤: {e}")
         raise HTTPException(
@@ -342,66 +1152,369 @@ async def transcribe_audio(file: UploadFile = File(...)) -> Dict[str, Any]:
             detail=f"內部伺服器錯誤: {str(e)}"
         )
 
+# 批次轉錄設定
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+BATCH_MANIFEST_ROOT = os.getenv("BATCH_MANIFEST_ROOT") or None  # 未設定時不允許讀取本機路徑
+
+def parse_batch_manifest(manifest: str) -> List[str]:
+    """
+    解析批次清單（JSON 陣列或每行一個路徑），並確認路徑都位於 BATCH_MANIFEST_ROOT 之下
+    """
+    if not BATCH_MANIFEST_ROOT:
+        raise HTTPException(
+            status_code=400,
+            detail="伺服器未設定 BATCH_MANIFEST_ROOT，無法使用本機路徑清單"
+        )
+
+    try:
+        entries = json.loads(manifest)
+        if not isinstance(entries, list):
+            raise ValueError
+    except ValueError:
+        entries = [line.strip() for line in manifest.splitlines() if line.strip()]
+
+    root = os.path.realpath(BATCH_MANIFEST_ROOT)
+    paths = []
+    for entry in entries:
+        path = os.path.realpath(os.path.join(root, str(entry)))
+        if os.path.commonpath([root, path]) != root:
+            raise HTTPException(
+                status_code=400,
+                detail=f"清單路徑不在允許的目錄內: {entry}"
+            )
+        paths.append(path)
+    return paths
+
+async def load_batch_item(item: Dict[str, Any]) -> bytes:
+    """
+    取得批次項目的音訊內容（上傳內容或本機檔案）
+    """
+    if item.get("content") is not None:
+        return item["content"]
+
+    path = item["path"]
+    if path.rsplit(".", 1)[-1].lower() not in ALLOWED_AUDIO_EXTENSIONS:
+        raise ValueError(f"不支援的檔案類型: {os.path.basename(path)}")
+    if os.path.getsize(path) > LONG_AUDIO_MAX_BYTES:
+        raise ValueError(LONG_AUDIO_SIZE_ERROR)
+    async with aiofiles.open(path, "rb") as audio_file:
+        return await audio_file.read()
+
+async def transcribe_batch_item(
+    index: int,
+    item: Dict[str, Any],
+    semaphore: asyncio.Semaphore,
+    upstream: asyncio.Semaphore,
+    with_mindmap: bool
+) -> Dict[str, Any]:
+    """
+    轉錄單一批次項目，錯誤以項目結果回傳而不中斷整批
+
+    semaphore 限制同時載入與解碼的項目數（記憶體）；上游呼叫數由整批共用的 upstream 限制，
+    長音訊的各段也在其中排隊，不會再乘上 LONG_AUDIO_CONCURRENCY
+    """
+    async with semaphore:
+        try:
+            if item.get("error"):
+                raise ValueError(item["error"])
+            content = await load_batch_item(item)
+            result = await transcribe_file_content(
+                content, item["filename"], with_mindmap=with_mindmap, upstream=upstream
+            )
+            return {"type": "result", "index": index, "filename": item["filename"], **result}
+        except Exception as e:
+            logger.warning(f"批次項目轉錄失敗 {item['filename']}: {e}")
+            return {
+                "type": "result",
+                "index": index,
+                "filename": item["filename"],
+                "success": False,
+                "error": str(e)
+            }
+
+@app.post("/transcribe/batch")
+async def transcribe_batch(
+    files: List[UploadFile] = File(default=[]),
+    manifest: Optional[str] = Form(default=None),
+    mindmap: bool = Query(False, description="是否為每個項目建立架構圖任務")
+) -> StreamingResponse:
+    """
+    批次語音轉文字端點
+
+    Args:
+        files: 多個上傳的音訊檔案
+        manifest: 本機音訊路徑清單（JSON 陣列或每行一個路徑，相對於 BATCH_MANIFEST_ROOT）
+
+    Returns:
+        NDJSON 串流，每完成一個項目輸出一行結果，最後輸出一行統計
+    """
+    tracing.record_span("multipart_parse", tracing.request_start())
+    items = []
+    for file in files:
+        item = {"filename": file.filename, "content": None}
+        if file.content_type not in ALLOWED_AUDIO_TYPES:
+            item["error"] = f"不支援的檔案類型: {file.content_type}"
+        else:
+            try:
+                with traced_stage("upload"):
+                    item["content"] = await read_upload(file, LONG_AUDIO_MAX_BYTES, LONG_AUDIO_SIZE_ERROR)
+            except HTTPException as e:
+                item["error"] = e.detail
+        items.append(item)
+
+    if manifest:
+        for path in parse_batch_manifest(manifest):
+            items.append({"filename": os.path.basename(path), "path": path})
+
+    if not items:
+        raise HTTPException(
+            status_code=400,
+            detail="請上傳音訊檔案或提供路徑清單"
+        )
+
+    async def stream_results():
+        semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+        upstream = asyncio.Semaphore(BATCH_CONCURRENCY)
+        tasks = [
+            asyncio.create_task(transcribe_batch_item(index, item, semaphore, upstream, mindmap))
+            for index, item in enumerate(items)
+        ]
+        succeeded = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                result = await next_done
+                succeeded += 1 if result["success"] else 0
+                yield json.dumps(result, ensure_ascii=False) + "\n"
+            yield json.dumps({
+                "type": "summary",
+                "total": len(items),
+                "succeeded": succeeded,
+                "failed": len(items) - succeeded
+            }, ensure_ascii=False) + "\n"
+        finally:
+            # 客戶端中斷時取消尚未完成的項目
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+# 即時轉錄工作階段：以重疊視窗轉錄連續片段，只回傳新確認的文字
+REALTIME_SAMPLE_RATE = 16000
+REALTIME_OVERLAP_SECONDS = float(os.getenv("REALTIME_OVERLAP_SECONDS", "1.5"))
+REALTIME_SESSION_MAX = int(os.getenv("REALTIME_SESSION_MAX", "500"))
+REALTIME_SESSION_IDLE_TIMEOUT = float(os.getenv("REALTIME_SESSION_IDLE_TIMEOUT", "300"))
+
+realtime_sessions = RealtimeSessionStore(
+    max_sessions=REALTIME_SESSION_MAX,
+    idle_timeout=REALTIME_SESSION_IDLE_TIMEOUT
+)
+
+WEBM_EBML_ID = b"\x1a\x45\xdf\xa3"
+WEBM_CLUSTER_ID = b"\x1f\x43\xb6\x75"
+
+def decode_session_chunk(session: RealtimeSession, content: bytes):
+    """
+    解碼工作階段的片段
+
+    片段可以是可獨立解碼的檔案，或是同一段 webm 錄音的後續片段（瀏覽器 MediaRecorder
+    以 timeslice 切出的片段只有第一個帶容器標頭）；後者以第一個片段保存的標頭補齊後再解碼
+    """
+    if not session.header and content.startswith(WEBM_EBML_ID):
+        cluster_index = content.find(WEBM_CLUSTER_ID)
+        if cluster_index > 0:
+            session.header = content[:cluster_index]
+    try:
+        samples, _ = audio_processing.decode_audio(content, session.sample_rate)
+    except Exception:
+        if not session.header or content.startswith(WEBM_EBML_ID):
+            raise
+        samples, _ = audio_processing.decode_audio(session.header + content, session.sample_rate)
+    return samples
+
+# 工作階段的增量架構圖：每個片段只產生節點修補，工作階段結束後保留到 MINDMAP_JOB_TTL 供客戶端取回
+mindmap_sessions = SessionMindmapStore(
+    max_sessions=REALTIME_SESSION_MAX,
+    idle_timeout=MINDMAP_JOB_TTL
+)
+
+def update_session_mindmap(session_id: str, text: str, final: bool) -> Tuple[SessionMindmap, Optional[Dict[str, Any]]]:
+    """
+    把新片段的文字併入工作階段架構圖
+
+    Returns:
+        (工作階段架構圖, 本機引擎立即產生的修補)；Gemini 的修補稍後由 /mindmap/session/{session_id} 取得
+    """
+    graph = mindmap_sessions.get_or_create(session_id)
+    graph.final = graph.final or final
+    patch = None
+    if text.strip():
+        if REALTIME_MINDMAP_MODEL == LOCAL_MINDMAP_MODEL or REALTIME_MINDMAP_TIERED:
+            try:
+                with traced_stage("mindmap_local"):
+                    patch = graph.apply_patch(*local_patch(graph, text), tier="local")
+            except Exception as e:
+                logger.warning(f"本機增量架構圖生成失敗，但不影響轉譯: {e}")
+        if REALTIME_MINDMAP_MODEL != LOCAL_MINDMAP_MODEL:
+            graph.pending_text.append(text)
+
+    # 同一工作階段一次只有一個 Gemini 請求，期間到達的片段合併到下一次
+    if graph.pending_text and (graph.task is None or graph.task.done()):
+        graph.task = asyncio.create_task(refine_session_mindmap(graph))
+        mindmap_job_tasks.add(graph.task)
+        graph.task.add_done_callback(mindmap_job_tasks.discard)
+    return graph, patch
+
+async def refine_session_mindmap(graph: SessionMindmap) -> None:
+    """
+    把累積的新增文字與現有節點摘要送給 Gemini，套用回傳的修補
+
+    文字太短時先保留，等下一個片段一起送出（工作階段最後一個片段除外）
+    """
+    while graph.pending_text:
+        text = join_transcript_texts(graph.pending_text)
+        if len(text.strip()) <= MINDMAP_MIN_TEXT_LENGTH and not graph.final:
+            return
+        graph.pending_text.clear()
+        try:
+            with traced_stage("mindmap", incremental=True):
+                response_text = await call_gemini(REALTIME_MINDMAP_MODEL, build_patch_prompt(graph.summary(), text))
+            graph.apply_patch(*parse_patch(response_text), tier="gemini")
+        except Exception as e:
+            # 失敗時保留本機引擎的節點，不重試以免同一段文字重複計費
+            logger.warning(f"Gemini 增量架構圖生成失敗: {e}")
+
+async def transcribe_realtime_session(
+    session_id: str,
+    content: bytes,
+    final: bool,
+    backend: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    以工作階段模式轉錄即時片段：視窗包含上一段尾段，轉錄後與已確認文字對齊去重
+
+    片段需可獨立解碼，或是同一段 webm 錄音的後續片段（見 decode_session_chunk）
+    """
+    session = realtime_sessions.get_or_create(session_id, REALTIME_SAMPLE_RATE)
+    sample_rate = session.sample_rate
+
+    async with session.lock:
+        try:
+            with traced_stage("decode"):
+                samples = await asyncio.to_thread(decode_session_chunk, session, content)
+        except Exception as e:
+            raise HTTPException(
+                status_code=400,
+                detail=f"無法解碼音訊片段（需為完整檔案或同一段 webm 錄音的後續片段）: {str(e)}"
+            )
+        chunk_index = session.chunk_index
+        window, offset = session.advance(samples, REALTIME_OVERLAP_SECONDS)
+
+        delta = ""
+        has_speech = True
+        if VAD_ENABLED:
+            has_speech = audio_processing.analyze_speech(samples, sample_rate).has_speech
+
+        if has_speech:
+            wav = await asyncio.to_thread(audio_processing.encode_wav, window, sample_rate)
+            transcript = await whisper_transcribe(
+                wav, suffix=".wav", response_format="text", use_cache=False, backend=backend
+            )
+            delta = stitch_transcript(session.committed_text, transcript)
+            session.committed_text = join_transcript_texts([session.committed_text, delta])
+        else:
+            logger.info("即時音訊片段未偵測到語音，略過轉錄")
+
+    if final:
+        realtime_sessions.remove(session_id)
+
+    with tracing.span("convert"):
+        transcribed_text = convert_to_traditional_chinese(delta)
+    # 架構圖以工作階段為單位增量更新，回傳節點修補而不是整份 Mermaid
+    mindmap_graph, mindmap_patch = update_session_mindmap(session_id, transcribed_text, final)
+    return {
+        "success": True,
+        "text": transcribed_text,
+        "original_text": delta,
+        "timestamp": "realtime",
+        "session_id": session_id,
+        "chunk_index": chunk_index,
+        "offset": offset,
+        "speech_detected": has_speech,
+        "mindmap": None,
+        "mindmap_job_id": None,
+        "mindmap_patch": mindmap_patch,
+        "mindmap_version": mindmap_graph.version,
+        "mindmap_pending": mindmap_graph.refining
+    }
+
 @app.post("/transcribe-realtime")
-async def transcribe_realtime_audio(file: UploadFile = File(...)) -> Dict[str, Any]:
+async def transcribe_realtime_audio(
+    file: UploadFile = File(...),
+    session_id: Optional[str] = Query(None, description="工作階段 ID，提供時以重疊視窗轉錄並只回傳新增文字"),
+    final: bool = Query(False, description="工作階段的最後一個片段，處理後釋放狀態"),
+    backend: Optional[str] = Query(None, description="轉錄後端：openai 或 local，預設依伺服器設定")
+) -> Dict[str, Any]:
     """
     即時語音轉文字端點 (適用於較短的音訊片段)
     
     Args:
         file: 上傳的音訊檔案片段
+        session_id: 可選的工作階段 ID；每個片段需可獨立解碼，或是同一段 webm 錄音的後續片段
+        final: 是否為工作階段的最後一個片段
+        backend: 轉錄後端（短片段可使用 local 省去網路往返）
         
     Returns:
         Dict containing transcribed text
     """
+    tracing.record_span("multipart_parse", tracing.request_start())
     try:
+        get_transcription_backend(backend)
+
         # 檢查檔案大小 (限制為 5MB 以確保即時性能)
-        content = await file.read()
-        if len(content) > 5 * 1024 * 1024:
-            raise HTTPException(
-                status_code=400,
-                detail="即時轉錄檔案大小限制為 5MB"
-            )
+        with traced_stage("upload"):
+            content = await read_upload(file, REALTIME_MAX_BYTES, REALTIME_SIZE_ERROR)
         
-        # 創建臨時檔案
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".webm") as temp_file:
-            temp_file.write(content)
-            temp_file_path = temp_file.name
+        if session_id:
+            return await transcribe_realtime_session(session_id, content, final, backend)
         
-        try:
-            # 使用 OpenAI Whisper API 進行語音轉文字
-            with open(temp_file_path, "rb") as audio_file:
-                transcript = client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio_file,
-                    response_format="text",
-                    language="zh"  # 指定中文語言
-                )
-            
-            # 直接使用原始轉譯結果，確保精確度
-            transcribed_text = transcript.strip()
-            
-            # 生成架構圖數據（使用 Gemini，可選，不影響主要轉譯）
-            mindmap_data = None
-            try:
-                if len(transcribed_text) > 20:  # 只有足夠長的文字才生成架構圖
-                    mindmap_data = generate_mindmap_data(transcribed_text, "gemini-1.5-flash")
-            except Exception as e:
-                logger.warning(f"架構圖生成失敗，但不影響轉譯: {e}")
-            
-            result = {
+        # 靜音片段直接回傳空結果，不呼叫 Whisper
+        has_speech, content, suffix = await detect_speech(content, ".webm")
+        if not has_speech:
+            logger.info("即時音訊片段未偵測到語音，略過轉錄")
+            return {
                 "success": True,
-                "text": transcribed_text,
+                "text": "",
                 "timestamp": "realtime",
-                "mindmap": mindmap_data
+                "speech_detected": False,
+                "mindmap": None,
+                "mindmap_job_id": None
             }
-            
-            return result
-            
-        finally:
-            # 清理臨時檔案
-            if os.path.exists(temp_file_path):
-                os.unlink(temp_file_path)
+        
+        # 使用選定的轉錄後端進行語音轉文字
+        transcript = await whisper_transcribe(content, suffix=suffix, response_format="text", backend=backend)
+        
+        # 轉換為繁體中文，保留原始轉譯結果
+        original_text = transcript.strip()
+        with tracing.span("convert"):
+            transcribed_text = convert_to_traditional_chinese(original_text)
+        
+        # 架構圖使用本機引擎時直接附上，否則改為背景任務（使用 Gemini），轉錄結果立即回傳
+        mindmap, mindmap_job_id = realtime_mindmap(transcribed_text)
+        
+        result = {
+            "success": True,
+            "text": transcribed_text,
+            "original_text": original_text,
+            "timestamp": "realtime",
+            "speech_detected": True,
+            "mindmap": mindmap,
+            "mindmap_job_id": mindmap_job_id
+        }
+        
+        return result
                 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"即時轉錄過程中發生錯誤: {e}")
         raise HTTPException(
@@ -409,6 +1522,232 @@ async def transcribe_realtime_audio(file: UploadFile = File(...)) -> Dict[str, A
             detail=f"即時轉錄錯誤: {str(e)}"
         )
 
+# WebSocket 串流轉錄設定
+WS_PARTIAL_INTERVAL = float(os.getenv("WS_PARTIAL_INTERVAL", "2.0"))  # 0 表示不送出部分結果
+WS_PARTIAL_MIN_BYTES = int(os.getenv("WS_PARTIAL_MIN_BYTES", str(16 * 1024)))
+WS_SEGMENT_MAX_BYTES = int(os.getenv("WS_SEGMENT_MAX_BYTES", str(1024 * 1024)))
+WS_MAX_PENDING_SEGMENTS = int(os.getenv("WS_MAX_PENDING_SEGMENTS", "2"))  # 每條連線同時轉錄的段落數
+
+class StreamingTranscriptionSession:
+    """
+    單一 WebSocket 連線的串流轉錄狀態
+
+    音訊以 webm/opus 連續片段送入；第一個片段中 Cluster 之前的位元組是
+    容器標頭，之後每個段落都以「標頭 + 從 Cluster 邊界開始的資料」組成完整檔案。
+    客戶端重新開始錄音時會送出新的 EBML 標頭，此時改用新的標頭。
+    """
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.session_id = uuid.uuid4().hex
+        self.header = b""
+        self.buffer = bytearray()
+        self.segment_index = 0
+        self.bytes_since_partial = 0
+        self.last_partial_at = time.monotonic()
+        self.partial_task: Optional[asyncio.Task] = None
+        self.background_tasks: set = set()
+        self.segment_slots = asyncio.Semaphore(WS_MAX_PENDING_SEGMENTS)
+        self.send_lock = asyncio.Lock()
+
+    async def send(self, message: Dict[str, Any]) -> None:
+        async with self.send_lock:
+            await self.websocket.send_json(message)
+
+    def spawn(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self.background_tasks.add(task)
+        task.add_done_callback(self._task_done)
+        return task
+
+    def _task_done(self, task: asyncio.Task) -> None:
+        self.background_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"串流背景任務失敗: {task.exception()}")
+
+    def add_frame(self, frame: bytes) -> None:
+        if not self.header or frame.startswith(WEBM_EBML_ID):
+            cluster_index = frame.find(WEBM_CLUSTER_ID)
+            self.header = frame[:cluster_index] if cluster_index > 0 else frame
+            frame = frame[len(self.header):]
+        self.buffer.extend(frame)
+        self.bytes_since_partial += len(frame)
+
+    def segment_audio(self, data: bytes) -> bytes:
+        return self.header + data
+
+    def should_send_partial(self) -> bool:
+        if WS_PARTIAL_INTERVAL <= 0 or not self.buffer:
+            return False
+        if self.partial_task is not None and not self.partial_task.done():
+            return False
+        return (
+            self.bytes_since_partial >= WS_PARTIAL_MIN_BYTES
+            and time.monotonic() - self.last_partial_at >= WS_PARTIAL_INTERVAL
+        )
+
+    def can_split(self) -> bool:
+        """
+        緩衝區中除了開頭之外還有 Cluster 邊界時才能自動切段，下一段才會從 Cluster 開始
+        """
+        return self.buffer.rfind(WEBM_CLUSTER_ID) > 0
+
+    def take_segment(self, final: bool) -> bytes:
+        """
+        取出目前段落；非結束時在最後一個 Cluster 邊界切開，剩餘資料留給下一段
+        """
+        cut = len(self.buffer)
+        if not final:
+            cut = self.buffer.rfind(WEBM_CLUSTER_ID)
+        data = bytes(self.buffer[:cut])
+        del self.buffer[:cut]
+        self.bytes_since_partial = len(self.buffer)
+        return data
+
+    async def run_partial(self) -> None:
+        segment_index = self.segment_index
+        self.bytes_since_partial = 0
+        self.last_partial_at = time.monotonic()
+        try:
+            transcript = await whisper_transcribe(
+                self.segment_audio(bytes(self.buffer)), suffix=".webm", response_format="text", use_cache=False
+            )
+            # 段落已經結束時丟棄過時的部分結果
+            if segment_index == self.segment_index:
+                await self.send({
+                    "type": "partial",
+                    "segment": segment_index,
+                    "text": convert_to_traditional_chinese(transcript.strip())
+                })
+        except Exception as e:
+            logger.warning(f"串流部分轉錄失敗: {e}")
+
+    def cut_segment(self, final: bool = False) -> tuple:
+        data = self.take_segment(final)
+        segment_index = self.segment_index
+        self.segment_index += 1
+        return segment_index, data
+
+    async def transcribe_pending_segment(self, segment_index: int, data: bytes) -> None:
+        try:
+            await self.transcribe_segment(segment_index, data)
+        finally:
+            self.segment_slots.release()
+
+    async def transcribe_segment(self, segment_index: int, data: bytes) -> None:
+        if not data:
+            return
+
+        try:
+            has_speech, content, suffix = await detect_speech(self.segment_audio(data), ".webm")
+            if not has_speech:
+                await self.send({"type": "final", "segment": segment_index, "text": "", "mindmap": None, "mindmap_job_id": None})
+                return
+            transcript = await whisper_transcribe(content, suffix=suffix, response_format="text")
+        except Exception as e:
+            logger.error(f"串流轉錄過程中發生錯誤: {e}")
+            await self.send({"type": "error", "segment": segment_index, "detail": f"串流轉錄錯誤: {str(e)}"})
+            return
+
+        transcribed_text = convert_to_traditional_chinese(transcript.strip())
+        # 片段並行轉錄、完成順序不固定，版本號依片段順序而不是完成順序
+        mindmap, mindmap_job_id = realtime_mindmap(transcribed_text, f"ws:{self.session_id}", segment_index + 1)
+        await self.send({
+            "type": "final",
+            "segment": segment_index,
+            "text": transcribed_text,
+            "mindmap": mindmap,
+            "mindmap_job_id": mindmap_job_id
+        })
+        if mindmap_job_id:
+            self.spawn(self.push_mindmap(segment_index, mindmap_job_id))
+
+    async def push_mindmap(self, segment_index: int, job_id: str) -> None:
+        """
+        架構圖任務完成後主動推送給客戶端
+        """
+        job = mindmap_jobs.get(job_id)
+        if job is None:
+            return
+        await job["done_event"].wait()
+        if job["status"] == "stale":
+            return  # 已有較新片段的架構圖，舊的升級直接丟棄
+        try:
+            await self.send({
+                "type": "mindmap",
+                "segment": segment_index,
+                "job_id": job_id,
+                "status": job["status"],
+                "version": job["version"],
+                "mindmap": job["mindmap"]
+            })
+        except Exception:
+            pass  # 連線可能已關閉
+
+    async def close(self) -> None:
+        for task in list(self.background_tasks):
+            task.cancel()
+
+@app.websocket("/ws/transcribe")
+async def websocket_transcribe(websocket: WebSocket):
+    """
+    WebSocket 串流語音轉文字端點
+
+    客戶端持續送出 webm/opus 二進位片段，並可送出文字控制訊息：
+      {"type": "flush"} 結束目前段落並取得最終結果
+      {"type": "stop"}  結束所有段落並關閉連線
+    伺服器回傳 partial / final / mindmap / error 訊息
+    """
+    await websocket.accept()
+    session = StreamingTranscriptionSession(websocket)
+    await session.send({"type": "ready", "session_id": session.session_id})
+
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+
+            if message.get("bytes") is not None:
+                frame = message["bytes"]
+                if session.header and session.buffer and frame.startswith(WEBM_EBML_ID):
+                    # 客戶端重新開始錄音：先以舊的標頭結束目前段落
+                    await session.transcribe_segment(*session.cut_segment(final=True))
+                session.add_frame(frame)
+                if len(session.buffer) >= WS_SEGMENT_MAX_BYTES and session.can_split():
+                    # 段落過長時在 Cluster 邊界自動切段並在背景轉錄；轉錄中的段落已達上限時
+                    # 先停止接收，讓傳送端感受到背壓，而不是無限制地累積上游呼叫
+                    await session.segment_slots.acquire()
+                    session.spawn(session.transcribe_pending_segment(*session.cut_segment()))
+                elif session.should_send_partial():
+                    session.partial_task = asyncio.create_task(session.run_partial())
+                continue
+
+            try:
+                control = json.loads(message.get("text") or "{}")
+            except json.JSONDecodeError:
+                await session.send({"type": "error", "detail": "無效的控制訊息"})
+                continue
+
+            if control.get("type") == "flush":
+                await session.transcribe_segment(*session.cut_segment(final=True))
+            elif control.get("type") == "stop":
+                await session.transcribe_segment(*session.cut_segment(final=True))
+                # 等待尚未完成的架構圖推送後再關閉
+                if session.background_tasks:
+                    await asyncio.wait(list(session.background_tasks), timeout=GEMINI_TIMEOUT)
+                await websocket.close()
+                break
+            else:
+                await session.send({"type": "error", "detail": f"未知的控制訊息: {control.get('type')}"})
+
+    except WebSocketDisconnect:
+        logger.info(f"串流轉錄連線中斷: {session.session_id}")
+    finally:
+        if session.partial_task is not None:
+            session.partial_task.cancel()
+        await session.close()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
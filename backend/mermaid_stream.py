@@ -0,0 +1,45 @@
+"""
+串流 Mermaid 輸出的逐行處理：把 Gemini 分段回傳的文字切成完整的行，並即時去除 markdown 代碼塊標記
+"""
+from typing import List
+
+
+class MermaidLineBuffer:
+    """
+    累積串流片段，只輸出已經完整的行
+
+    代碼塊標記（```mermaid、```）可能被切在兩個片段之間，
+    因此只在整行到齊後才判斷並略過；開頭的空行也一併略過。
+    """
+
+    def __init__(self):
+        self.pending = ""
+        self.lines: List[str] = []
+
+    def feed(self, chunk: str) -> List[str]:
+        self.pending += chunk
+        *complete, self.pending = self.pending.split("\n")
+        return self._accept(complete)
+
+    def flush(self) -> List[str]:
+        remaining, self.pending = self.pending, ""
+        return self._accept([remaining])
+
+    def _accept(self, lines: List[str]) -> List[str]:
+        accepted = []
+        for line in lines:
+            line = line.rstrip("\r")
+            if line.strip().startswith("```"):
+                # 與非串流版本一致：去掉標記後若還有內容（例如 ```graph TD）則保留
+                line = line.replace("```mermaid", "").replace("```", "").strip()
+                if not line:
+                    continue
+            if not line.strip() and not self.lines:
+                continue
+            accepted.append(line)
+            self.lines.append(line)
+        return accepted
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.lines).strip()
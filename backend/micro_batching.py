@@ -0,0 +1,110 @@
+"""
+微批次排程：收集並行請求，在時間窗內湊成一批後一次推論，再把結果分送回各請求
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    微批次排程器
+
+    每批最多 max_batch_size 個項目；第一個項目到達後最多再等待 max_wait_ms 毫秒湊批。
+    同時執行的批次數受 max_inflight_batches 限制（通常等於推論工作程序數），
+    工作程序忙碌時新請求會在佇列中累積，下一批自然變大，以延遲換取吞吐量。
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[List[Any]], Awaitable[List[Any]]],
+        max_batch_size: int,
+        max_wait_ms: float,
+        max_inflight_batches: int = 1
+    ):
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.max_inflight_batches = max(1, max_inflight_batches)
+        self.queue: "Optional[asyncio.Queue[Tuple[Any, asyncio.Future]]]" = None
+        self.slots: Optional[asyncio.Semaphore] = None
+        self.dispatcher: Optional[asyncio.Task] = None
+        self.batch_tasks: set = set()
+        self.batches = 0
+        self.items = 0
+
+    def start(self) -> None:
+        if self.dispatcher is None:
+            self.queue = asyncio.Queue()
+            self.slots = asyncio.Semaphore(self.max_inflight_batches)
+            self.dispatcher = asyncio.create_task(self._dispatch())
+
+    async def submit(self, item: Any) -> Any:
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((item, future))
+        return await future
+
+    async def _dispatch(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            # 先取得執行位置再湊批，等待期間到達的請求會併入同一批
+            await self.slots.acquire()
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                if not self.queue.empty():
+                    batch.append(self.queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # 已取消（例如客戶端中斷）的請求不送推論
+            batch = [(item, future) for item, future in batch if not future.done()]
+            if not batch:
+                self.slots.release()
+                continue
+
+            task = asyncio.create_task(self._run(batch))
+            self.batch_tasks.add(task)
+            task.add_done_callback(self.batch_tasks.discard)
+
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future]]) -> None:
+        try:
+            self.batches += 1
+            self.items += len(batch)
+            results = await self.run_batch([item for item, _ in batch])
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        except Exception as e:
+            logger.warning(f"批次推論失敗（{len(batch)} 個項目）: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self.slots.release()
+
+    async def close(self) -> None:
+        if self.dispatcher is not None:
+            self.dispatcher.cancel()
+            self.dispatcher = None
+        for task in list(self.batch_tasks):
+            task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "queued": self.queue.qsize() if self.queue is not None else 0,
+            "batches": self.batches,
+            "items": self.items,
+            "average_batch_size": round(self.items / self.batches, 2) if self.batches else 0
+        }
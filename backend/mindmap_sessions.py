@@ -0,0 +1,271 @@
+"""
+即時工作階段的增量架構圖：保留目前的節點圖，每個新片段只產生修補（新增與變更的節點）
+
+修補先由本機關鍵詞引擎即時產生，再由 Gemini 依「新增文字 + 現有節點摘要」補充與修正；
+每套用一次修補版本號加一，客戶端依版本順序套用即可得到與伺服器相同的節點圖。
+"""
+import asyncio
+import json
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from caches import normalize_text
+from local_mindmap import MAX_LABEL_LENGTH, MindmapNode, build_graph, extract_keyphrases, render_mermaid, split_sentences
+
+MAX_SESSION_NODES = 40  # 整張圖的節點上限，超過後只接受修改
+MAX_PATCH_NODES = 6  # Gemini 每次最多新增的節點數
+MAX_LOCAL_PATCH_NODES = 3  # 本機引擎每個片段最多新增的節點數
+MAX_PATCH_LOG = 200  # 保留的修補數量，更舊的版本只能取得完整快照
+
+Patch = Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]
+
+
+def _clean_label(label: Any) -> str:
+    label = " ".join(str(label or "").split())
+    return label[:MAX_LABEL_LENGTH]
+
+
+class SessionMindmap:
+    """
+    單一工作階段的節點圖、修補紀錄，以及等待送往 Gemini 的新增文字
+    """
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.nodes: "OrderedDict[str, MindmapNode]" = OrderedDict()
+        self.version = 0
+        self.next_node = 1
+        self.patches: Deque[Dict[str, Any]] = deque(maxlen=MAX_PATCH_LOG)
+        self.pending_text: List[str] = []
+        self.task: Optional[asyncio.Task] = None
+        self.final = False  # 工作階段已結束，剩餘的短文字不再等待下一個片段
+        self.updated = asyncio.Event()
+        self.last_seen = time.monotonic()
+
+    @property
+    def root_id(self) -> Optional[str]:
+        return next(iter(self.nodes), None)
+
+    @property
+    def refining(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    def summary(self) -> str:
+        """
+        送給 Gemini 的精簡節點摘要，每行「節點ID | 上層節點ID | 標籤」
+        """
+        return "\n".join(f"{node.id} | {node.parent or '-'} | {node.label}" for node in self.nodes.values())
+
+    def find_label(self, label: str) -> Optional[str]:
+        key = normalize_text(label)
+        if not key:
+            return None
+        for node in self.nodes.values():
+            existing = normalize_text(node.label)
+            if existing and (key == existing or key in existing or existing in key):
+                return node.id
+        return None
+
+    def _is_descendant(self, node_id: str, ancestor_id: str) -> bool:
+        while node_id is not None:
+            if node_id == ancestor_id:
+                return True
+            node_id = self.nodes[node_id].parent
+        return False
+
+    def apply_patch(self, added: List[Dict[str, Any]], changed: List[Dict[str, Any]], tier: str) -> Optional[Dict[str, Any]]:
+        """
+        套用修補並回傳實際生效的部分；沒有任何變化時回傳 None
+
+        新節點的 id 只是暫時代號（例如 new1），可作為同一次修補中其他節點的 parent，
+        套用時會換成正式的節點 ID；parent 無效時掛到根節點，圖為空時第一個節點成為根節點。
+        """
+        id_map: Dict[str, str] = {}
+        applied_added = []
+        for item in added:
+            label = _clean_label(item.get("label"))
+            temp_id = str(item.get("id") or "")
+            if not label:
+                continue
+            existing = self.find_label(label)
+            if existing is not None:
+                id_map[temp_id] = existing
+                continue
+            if len(self.nodes) >= MAX_SESSION_NODES:
+                break
+            parent_ref = str(item.get("parent") or "")
+            parent = id_map.get(parent_ref, parent_ref)
+            if parent not in self.nodes:
+                parent = self.root_id
+            node_id = f"N{self.next_node}"
+            self.next_node += 1
+            self.nodes[node_id] = MindmapNode(id=node_id, label=label, parent=parent, score=0.0)
+            if temp_id:
+                id_map[temp_id] = node_id
+            applied_added.append({"id": node_id, "label": label, "parent": parent})
+
+        applied_changed = []
+        for item in changed:
+            node = self.nodes.get(str(item.get("id") or ""))
+            if node is None:
+                continue
+            update: Dict[str, Any] = {}
+            label = _clean_label(item.get("label"))
+            if label and label != node.label:
+                node.label = label
+                update["label"] = label
+            parent_ref = str(item.get("parent") or "")
+            parent = id_map.get(parent_ref, parent_ref)
+            # 根節點不移動，也不能移到自己的子孫底下形成循環
+            if (
+                node.parent is not None and parent in self.nodes and parent != node.parent
+                and not self._is_descendant(parent, node.id)
+            ):
+                node.parent = parent
+                update["parent"] = parent
+            if update:
+                applied_changed.append({"id": node.id, **update})
+
+        if not applied_added and not applied_changed:
+            return None
+        self.version += 1
+        patch = {
+            "version": self.version,
+            "base_version": self.version - 1,
+            "tier": tier,
+            "added": applied_added,
+            "changed": applied_changed
+        }
+        self.patches.append(patch)
+        self.updated.set()
+        self.updated = asyncio.Event()
+        return patch
+
+    def patches_since(self, version: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        取得 version 之後的修補；紀錄已不完整時回傳 None，客戶端需改用完整快照
+        """
+        if version == self.version:
+            return []
+        if version > self.version or not self.patches or self.patches[0]["base_version"] > version:
+            return None
+        return [patch for patch in self.patches if patch["version"] > version]
+
+    def snapshot(self) -> Dict[str, Any]:
+        nodes = list(self.nodes.values())
+        return {
+            "version": self.version,
+            "nodes": [{"id": node.id, "label": node.label, "parent": node.parent} for node in nodes],
+            "mindmap": {"type": "mermaid", "mermaid_code": render_mermaid(nodes)} if nodes else None
+        }
+
+
+def local_patch(graph: SessionMindmap, text: str) -> Patch:
+    """
+    以本機關鍵詞引擎產生修補：空圖時建立完整階層，之後只把新關鍵詞掛到同句出現最多的既有節點
+    """
+    if not graph.nodes:
+        return [{"id": node.id, "label": node.label, "parent": node.parent} for node in build_graph(text)], []
+
+    keyphrases, _ = extract_keyphrases(text, limit=MAX_LOCAL_PATCH_NODES + len(graph.nodes))
+    new_phrases = [phrase for phrase, _ in keyphrases if graph.find_label(phrase) is None][:MAX_LOCAL_PATCH_NODES]
+    sentences = split_sentences(text)
+
+    added = []
+    for index, phrase in enumerate(new_phrases):
+        best_parent, best_count = graph.root_id, 0
+        for node in graph.nodes.values():
+            count = sum(1 for sentence in sentences if phrase in sentence and node.label in sentence)
+            if count > best_count:
+                best_parent, best_count = node.id, count
+        added.append({"id": f"new{index + 1}", "label": phrase, "parent": best_parent})
+    return added, []
+
+
+def build_patch_prompt(summary: str, text: str) -> str:
+    """
+    構建增量架構圖的 Gemini 提示：只送新增文字與現有節點摘要
+    """
+    return f"""
+你正在維護一張隨著語音轉錄即時更新的內容架構圖。
+
+目前的節點（每行：節點ID | 上層節點ID | 標籤，根節點的上層為 -）：
+{summary or "（目前沒有節點）"}
+
+新增的轉錄文字：
+{text}
+
+請根據新增的文字更新架構圖，只回傳需要新增或修改的節點。
+
+要求：
+1. 新節點的 id 使用 new1、new2…，parent 可以是既有節點 ID 或同一次新增的節點 id
+2. 每個節點的文字長度不超過20個字符，使用中文標籤
+3. 每次最多新增{MAX_PATCH_NODES}個節點，與既有節點重複的主題不要再新增
+4. 既有節點的標籤或位置不精確時可以在 changed 中修改，沒有需要修改的節點時回傳空陣列
+
+請只返回 JSON，不要包含其他說明文字。
+
+示例格式：
+{{"added": [{{"id": "new1", "label": "子主題", "parent": "N1"}}], "changed": [{{"id": "N2", "label": "更精確的標籤", "parent": "N1"}}]}}
+"""
+
+
+def parse_patch(response_text: str) -> Patch:
+    """
+    解析 Gemini 回傳的修補 JSON（容許 markdown 代碼塊標記與前後說明文字）
+    """
+    text = response_text.replace("```json", "").replace("```", "").strip()
+    start, end = text.find("{"), text.rfind("}")
+    if start < 0 or end < start:
+        raise ValueError("Gemini 回傳的修補不是 JSON")
+    data = json.loads(text[start:end + 1])
+    if not isinstance(data, dict):
+        raise ValueError("Gemini 回傳的修補格式錯誤")
+    added = [item for item in data.get("added") or [] if isinstance(item, dict)][:MAX_PATCH_NODES]
+    changed = [item for item in data.get("changed") or [] if isinstance(item, dict)]
+    return added, changed
+
+
+class SessionMindmapStore:
+    """
+    具閒置逾時與數量上限的增量架構圖儲存；工作階段結束後仍保留一段時間，讓客戶端取回最後的修補
+    """
+
+    def __init__(self, max_sessions: int, idle_timeout: float):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.sessions: "OrderedDict[str, SessionMindmap]" = OrderedDict()
+
+    def get_or_create(self, session_id: str) -> SessionMindmap:
+        graph = self.sessions.get(session_id)
+        if graph is None:
+            # 只有建立新工作階段時才需要騰出空間，進行中的工作階段不會被新的片段擠掉
+            self.prune(make_room=True)
+            graph = self.sessions[session_id] = SessionMindmap(session_id)
+        else:
+            self.sessions.move_to_end(session_id)
+        graph.last_seen = time.monotonic()
+        self.prune()
+        return graph
+
+    def get(self, session_id: str) -> Optional[SessionMindmap]:
+        return self.sessions.get(session_id)
+
+    def prune(self, make_room: bool = False) -> None:
+        """
+        清除閒置逾時的架構圖；make_room 為 True 時另外確保還能再放入一個工作階段
+        """
+        now = time.monotonic()
+        while self.sessions:
+            _, graph = next(iter(self.sessions.items()))
+            if (make_room and len(self.sessions) >= self.max_sessions) or now - graph.last_seen > self.idle_timeout:
+                self.sessions.popitem(last=False)
+            else:
+                break
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sessions": len(self.sessions),
+            "refining": sum(1 for graph in self.sessions.values() if graph.refining)
+        }
@@ -0,0 +1,136 @@
+"""
+即時轉錄工作階段：保留每個工作階段的音訊尾段與已確認文字，
+讓連續的音訊片段以重疊視窗轉錄，並去除重疊部分的重複文字
+"""
+import asyncio
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+STITCH_MAX_SKIP = 4  # 視窗開頭可能是被截斷的半個字詞，允許略過的字元數
+STITCH_MIN_OVERLAP = 2  # 至少重疊幾個字元才視為對齊成功
+STITCH_CONTEXT_CHARS = 200  # 只與已確認文字的最後這些字元比對
+
+
+@dataclass
+class RealtimeSession:
+    """單一即時轉錄工作階段的狀態"""
+    session_id: str
+    sample_rate: int
+    tail: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.float32))
+    committed_text: str = ""
+    # 第一個 webm 片段中 Cluster 之前的容器標頭，用來補齊瀏覽器 MediaRecorder 的後續片段
+    header: bytes = b""
+    chunk_index: int = 0
+    elapsed: float = 0.0
+    last_seen: float = field(default_factory=time.monotonic)
+    # 同一工作階段的片段依抵達順序逐一處理
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+    def advance(self, samples: np.ndarray, overlap_seconds: float) -> Tuple[np.ndarray, float]:
+        """
+        以「上一段尾段 + 新片段」組成轉錄視窗，並保留視窗最後 overlap_seconds 作為下一次的尾段
+
+        Returns:
+            (視窗 PCM, 新片段在工作階段中的起始秒數)
+        """
+        window = np.concatenate([self.tail, samples]) if len(self.tail) else samples
+        overlap_samples = int(overlap_seconds * self.sample_rate)
+        self.tail = window[-overlap_samples:].copy() if overlap_samples > 0 else window[:0]
+        offset = self.elapsed
+        self.elapsed += len(samples) / self.sample_rate
+        self.chunk_index += 1
+        return window, offset
+
+
+class RealtimeSessionStore:
+    """
+    具閒置逾時與數量上限的工作階段儲存
+    """
+
+    def __init__(self, max_sessions: int, idle_timeout: float):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.sessions: "OrderedDict[str, RealtimeSession]" = OrderedDict()
+
+    def get_or_create(self, session_id: str, sample_rate: int) -> RealtimeSession:
+        session = self.sessions.get(session_id)
+        if session is None:
+            # 只有建立新工作階段時才需要騰出空間，既有工作階段的片段不會擠掉其他工作階段
+            self.prune(make_room=True)
+            session = RealtimeSession(session_id=session_id, sample_rate=sample_rate)
+            self.sessions[session_id] = session
+        else:
+            self.sessions.move_to_end(session_id)
+        session.last_seen = time.monotonic()
+        self.prune()
+        return session
+
+    def remove(self, session_id: str) -> Optional[RealtimeSession]:
+        return self.sessions.pop(session_id, None)
+
+    def prune(self, make_room: bool = False) -> None:
+        """
+        清除閒置逾時的工作階段；make_room 為 True 時另外確保還能再放入一個工作階段
+        """
+        now = time.monotonic()
+        while self.sessions:
+            _, session = next(iter(self.sessions.items()))
+            if (make_room and len(self.sessions) >= self.max_sessions) or now - session.last_seen > self.idle_timeout:
+                self.sessions.popitem(last=False)
+            else:
+                break
+
+
+def _comparable_chars(text: str) -> Tuple[str, List[int]]:
+    """
+    取出用於比對的字元（忽略空白、標點與大小寫），並記錄每個字元在原文中的位置
+    """
+    chars = []
+    positions = []
+    for index, char in enumerate(text):
+        if char.isspace() or unicodedata.category(char).startswith("P"):
+            continue
+        chars.append(unicodedata.normalize("NFKC", char).lower())
+        positions.append(index)
+    return "".join(chars), positions
+
+
+def stitch_transcript(committed_text: str, window_text: str) -> str:
+    """
+    以最長「已確認文字後綴 = 視窗文字前綴」對齊兩段文字，只回傳新增的部分
+
+    視窗音訊包含上一段的尾段，因此視窗文字開頭通常與已確認文字的結尾重複；
+    找不到足夠長的重疊時視為沒有重複，回傳整段視窗文字。
+    """
+    window_text = window_text.strip()
+    if not committed_text or not window_text:
+        return window_text
+
+    committed, _ = _comparable_chars(committed_text[-STITCH_CONTEXT_CHARS:])
+    window, window_positions = _comparable_chars(window_text)
+
+    best_overlap = 0
+    best_end = 0
+    for skip in range(min(STITCH_MAX_SKIP, len(window)) + 1):
+        for size in range(min(len(committed), len(window) - skip), STITCH_MIN_OVERLAP - 1, -1):
+            if size <= best_overlap:
+                break
+            if committed[-size:] == window[skip:skip + size]:
+                best_overlap = size
+                best_end = skip + size
+                break
+
+    if best_overlap == 0:
+        return window_text
+
+    cut = window_positions[best_end - 1] + 1
+    delta = window_text[cut:]
+    # 去掉重疊邊界殘留的標點與空白
+    while delta and (delta[0].isspace() or unicodedata.category(delta[0]).startswith("P")):
+        delta = delta[1:]
+    return delta
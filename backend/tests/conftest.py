@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 後端模組是平鋪在 backend/ 的單檔模組，測試時直接加入匯入路徑
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
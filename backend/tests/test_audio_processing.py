@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from audio_processing import find_split_points
+
+SAMPLE_RATE = 16000
+
+
+def noise(seconds, seed=0):
+    rng = np.random.default_rng(seed)
+    return (rng.standard_normal(int(seconds * SAMPLE_RATE)) * 0.1).astype(np.float32)
+
+
+def lengths(bounds):
+    return [(end - start) / SAMPLE_RATE for start, end in bounds]
+
+
+@pytest.mark.parametrize(
+    "seconds, target, max_seconds, search",
+    [
+        # 剩餘長度只比切段門檻多一點點，不能留下極短的最後一段
+        (195.06, 180, 780, 15),
+        (200, 180, 780, 15),
+        (370, 180, 780, 15),
+        (1000, 180, 780, 15),
+        (600, 180, 190, 15),
+        # 目標長度不大於搜尋範圍時，搜尋範圍縮為目標長度的一半，不會切出 30ms 的片段
+        (10, 1, 5, 15),
+        (20, 10, 12, 15),
+        (3.3, 1, 1.2, 15),
+    ],
+)
+def test_split_lengths(seconds, target, max_seconds, search):
+    samples = noise(seconds)
+    bounds = find_split_points(samples, SAMPLE_RATE, target, max_seconds, search)
+
+    assert bounds[0][0] == 0 and bounds[-1][1] == len(samples)
+    assert all(bounds[i][1] == bounds[i + 1][0] for i in range(len(bounds) - 1))
+    search = min(search, target / 2)
+    for length in lengths(bounds):
+        assert (target - search) / 2 <= length <= max_seconds
+
+
+def test_short_audio_is_not_split():
+    samples = noise(190)
+
+    assert find_split_points(samples, SAMPLE_RATE, 180, 780) == [(0, len(samples))]
+
+
+def test_cuts_at_silence():
+    samples = noise(400)
+    samples[175 * SAMPLE_RATE:177 * SAMPLE_RATE] = 0
+    bounds = find_split_points(samples, SAMPLE_RATE, 180, 780)
+
+    assert 175 <= bounds[0][1] / SAMPLE_RATE <= 177
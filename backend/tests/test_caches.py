@@ -0,0 +1,88 @@
+import asyncio
+import json
+import os
+
+from caches import DISK_PRUNE_LOW_WATER, TranscriptCache
+
+
+def entry_size(value):
+    return len(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+
+
+def test_memory_byte_budget_evicts_least_recent():
+    value = {"text": "x" * 20}
+    size = entry_size(value)
+    cache = TranscriptCache(max_bytes=size * 2)
+
+    async def run():
+        await cache.set("a", value)
+        await cache.set("b", value)
+        assert await cache.get("a") == value
+        await cache.set("c", value)
+        # 超過預算時淘汰最久未使用的 b
+        assert await cache.get("b") is None
+        assert await cache.get("c") == value
+
+    asyncio.run(run())
+    assert list(cache.entries) == ["a", "c"]
+    assert cache.current_bytes == size * 2
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_oversized_entry_is_not_kept_in_memory():
+    cache = TranscriptCache(max_bytes=10)
+    asyncio.run(cache.set("a", {"text": "x" * 20}))
+
+    assert not cache.entries and cache.current_bytes == 0
+
+
+def test_disk_hit_from_new_instance(tmp_path):
+    value = {"text": "今天天氣很好"}
+    asyncio.run(TranscriptCache(max_bytes=0, disk_dir=str(tmp_path)).set("key", value))
+
+    cache = TranscriptCache(max_bytes=1024, disk_dir=str(tmp_path))
+    assert cache.disk_bytes == entry_size(value)
+    assert asyncio.run(cache.get("key")) == value
+    assert cache.disk_hits == 1
+    # 磁碟命中後放入記憶體層
+    assert "key" in cache.entries
+    assert [name for name in os.listdir(tmp_path)] == ["key.json"]
+
+
+def test_overwrite_does_not_double_count(tmp_path):
+    cache = TranscriptCache(max_bytes=0, disk_dir=str(tmp_path))
+
+    async def run():
+        await cache.set("key", {"text": "short"})
+        await cache.set("key", {"text": "a bit longer"})
+
+    asyncio.run(run())
+    assert cache.disk_bytes == entry_size({"text": "a bit longer"})
+
+
+def test_corrupt_disk_entry_is_removed(tmp_path):
+    cache = TranscriptCache(max_bytes=0, disk_dir=str(tmp_path))
+    asyncio.run(cache.set("key", {"text": "ok"}))
+    (tmp_path / "key.json").write_text('{"text": "o', encoding="utf-8")
+
+    assert asyncio.run(cache.get("key")) is None
+    assert not (tmp_path / "key.json").exists()
+
+
+def test_prune_to_low_water(tmp_path):
+    value = {"text": "x" * 90}
+    size = entry_size(value)
+    cache = TranscriptCache(max_bytes=0, disk_dir=str(tmp_path), disk_max_bytes=size * 10)
+
+    async def run():
+        for index in range(10):
+            await cache.set(f"k{index}", value)
+            # 依寫入順序設定修改時間，刪除順序才可預期
+            os.utime(tmp_path / f"k{index}.json", (index, index))
+        await cache.set("k10", value)
+
+    asyncio.run(run())
+    remaining = sorted(os.listdir(tmp_path))
+    assert cache.disk_bytes == size * len(remaining)
+    assert cache.disk_bytes <= cache.disk_max_bytes * DISK_PRUNE_LOW_WATER
+    assert "k0.json" not in remaining and "k10.json" in remaining
@@ -0,0 +1,34 @@
+import pytest
+
+from caches import normalize_text
+from local_mindmap import _drop_contained, extract_keyphrases
+
+
+@pytest.mark.parametrize(
+    "selected, expected",
+    [
+        # 完全相同的詞組只保留第一個（分數較高者）
+        ([("語音辨識", 0.5), ("即時串流", 0.4), ("語音辨識", 0.3)], [("語音辨識", 0.5), ("即時串流", 0.4)]),
+        # 正規化後相同（大小寫、全半形、標點）也視為重複
+        ([("Whisper API", 0.5), ("whisper api", 0.4), ("ＡＰＩ文件", 0.3)], [("Whisper API", 0.5), ("ＡＰＩ文件", 0.3)]),
+        # 被較長詞組包含的只保留較長者
+        ([("語音", 0.5), ("語音辨識", 0.4)], [("語音辨識", 0.4)]),
+        ([("語音辨識", 0.5), ("即時串流", 0.4)], [("語音辨識", 0.5), ("即時串流", 0.4)]),
+    ],
+)
+def test_drop_contained(selected, expected):
+    assert _drop_contained(selected) == expected
+
+
+def test_keyphrases_are_unique():
+    text = (
+        "即時音訊串流需要穩定的網路。即時音訊串流的延遲要低。"
+        "語音辨識模型處理即時音訊串流。語音辨識模型部署在伺服器。"
+        "伺服器負責語音辨識模型的推論。"
+    )
+    keyphrases, _ = extract_keyphrases(text, limit=10)
+    keys = [normalize_text(term) for term, _ in keyphrases]
+
+    assert keyphrases
+    assert len(keys) == len(set(keys))
+    assert not any(a != b and a in b for a in keys for b in keys)
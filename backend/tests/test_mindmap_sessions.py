@@ -0,0 +1,115 @@
+import pytest
+
+from mindmap_sessions import SessionMindmap, SessionMindmapStore
+
+
+def make_graph():
+    graph = SessionMindmap("test")
+    graph.apply_patch(
+        [
+            {"id": "new1", "label": "架構設計", "parent": None},
+            {"id": "new2", "label": "資料庫", "parent": "new1"},
+            {"id": "new3", "label": "索引", "parent": "new2"},
+        ],
+        [],
+        "local",
+    )
+    return graph
+
+
+def parents(graph):
+    return {node.label: node.parent for node in graph.nodes.values()}
+
+
+def test_first_node_becomes_root_and_temp_ids_are_remapped():
+    graph = make_graph()
+
+    assert [node.id for node in graph.nodes.values()] == ["N1", "N2", "N3"]
+    assert parents(graph) == {"架構設計": None, "資料庫": "N1", "索引": "N2"}
+    assert graph.version == 1
+
+
+@pytest.mark.parametrize(
+    "added, expected_parent",
+    [
+        # 引用同一次修補中的暫時代號
+        ([{"id": "new1", "label": "快取", "parent": "N2"}, {"id": "new2", "label": "失效策略", "parent": "new1"}], "N4"),
+        # parent 無效時掛到根節點
+        ([{"id": "new1", "label": "失效策略", "parent": "N99"}], "N1"),
+        ([{"id": "new1", "label": "失效策略"}], "N1"),
+    ],
+)
+def test_added_node_parent(added, expected_parent):
+    graph = make_graph()
+    patch = graph.apply_patch(added, [], "gemini")
+
+    assert patch["added"][-1] == {"id": f"N{3 + len(added)}", "label": "失效策略", "parent": expected_parent}
+    assert patch["version"] == 2 and patch["base_version"] == 1
+
+
+def test_duplicate_label_maps_to_existing_node():
+    graph = make_graph()
+    patch = graph.apply_patch(
+        [{"id": "new1", "label": "資料庫", "parent": "N1"}, {"id": "new2", "label": "分片", "parent": "new1"}],
+        [],
+        "gemini",
+    )
+
+    assert patch["added"] == [{"id": "N4", "label": "分片", "parent": "N2"}]
+
+
+@pytest.mark.parametrize(
+    "changed, expected",
+    [
+        # 根節點不移動
+        ([{"id": "N1", "parent": "N2"}], None),
+        # 移到自己的子孫底下會形成循環
+        ([{"id": "N2", "parent": "N3"}], None),
+        # 沒有任何實際變化
+        ([{"id": "N2", "label": "資料庫", "parent": "N1"}], None),
+        ([{"id": "N99", "label": "不存在"}], None),
+        ([{"id": "N3", "label": "複合索引", "parent": "N1"}], [{"id": "N3", "label": "複合索引", "parent": "N1"}]),
+    ],
+)
+def test_changed_nodes(changed, expected):
+    graph = make_graph()
+    patch = graph.apply_patch([], changed, "gemini")
+
+    if expected is None:
+        assert patch is None
+        assert graph.version == 1
+    else:
+        assert patch["changed"] == expected
+
+
+def test_noop_patch_returns_none():
+    graph = make_graph()
+
+    assert graph.apply_patch([], [], "gemini") is None
+    assert graph.apply_patch([{"id": "new1", "label": "  "}], [], "gemini") is None
+    assert graph.version == 1
+
+
+def test_patches_since():
+    graph = make_graph()
+    graph.apply_patch([{"id": "new1", "label": "快取", "parent": "N1"}], [], "gemini")
+
+    assert graph.patches_since(2) == []
+    assert graph.patches_since(3) is None
+    assert [patch["version"] for patch in graph.patches_since(0)] == [1, 2]
+    assert [patch["version"] for patch in graph.patches_since(1)] == [2]
+
+    graph.patches.popleft()
+    assert graph.patches_since(0) is None
+
+
+def test_store_keeps_existing_session_at_capacity():
+    store = SessionMindmapStore(max_sessions=2, idle_timeout=60)
+    first = store.get_or_create("a")
+    store.get_or_create("b")
+
+    assert store.get_or_create("a") is first
+    assert list(store.sessions) == ["b", "a"]
+
+    store.get_or_create("c")
+    assert list(store.sessions) == ["a", "c"]
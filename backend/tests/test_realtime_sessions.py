@@ -0,0 +1,52 @@
+import pytest
+
+from realtime_sessions import RealtimeSessionStore, stitch_transcript
+
+
+@pytest.mark.parametrize(
+    "committed, window, expected",
+    [
+        # 視窗開頭與已確認文字結尾重疊，只回傳新增部分
+        ("今天我們來討論架構設計", "架構設計的三個重點", "的三個重點"),
+        # 視窗開頭是被截斷的半個字詞，略過後仍能對齊
+        ("今天我們來討論架構設計", "呃架構設計的三個重點", "的三個重點"),
+        # 比對忽略標點、空白與大小寫，並去掉邊界殘留的標點
+        ("We talked about the Design.", "the design, and then testing", "and then testing"),
+        # 沒有重疊時回傳整段視窗文字
+        ("今天我們來討論架構設計", "完全不同的內容", "完全不同的內容"),
+        # 重疊太短不算對齊
+        ("今天我們來討論架構設計", "計畫開始", "計畫開始"),
+        # 還沒有已確認文字時回傳去除前後空白的視窗文字
+        ("", "  第一段文字  ", "第一段文字"),
+        ("已確認的文字", "", ""),
+    ],
+)
+def test_stitch_transcript(committed, window, expected):
+    assert stitch_transcript(committed, window) == expected
+
+
+def test_store_keeps_existing_session_at_capacity():
+    store = RealtimeSessionStore(max_sessions=2, idle_timeout=60)
+    first = store.get_or_create("a", 16000)
+    store.get_or_create("b", 16000)
+
+    assert store.get_or_create("a", 16000) is first
+    assert list(store.sessions) == ["b", "a"]
+
+
+def test_store_evicts_least_recent_session_for_new_session():
+    store = RealtimeSessionStore(max_sessions=2, idle_timeout=60)
+    store.get_or_create("a", 16000)
+    store.get_or_create("b", 16000)
+    store.get_or_create("a", 16000)
+    store.get_or_create("c", 16000)
+
+    assert list(store.sessions) == ["a", "c"]
+
+
+def test_store_prunes_idle_sessions():
+    store = RealtimeSessionStore(max_sessions=10, idle_timeout=60)
+    store.get_or_create("a", 16000).last_seen -= 120
+    store.get_or_create("b", 16000)
+
+    assert list(store.sessions) == ["b"]
@@ -0,0 +1,244 @@
+"""
+請求追蹤：以 contextvars 記錄每個請求各階段的 span，並匯出到 JSONL 檔案或收集器
+
+追蹤 ID 沿用請求的 W3C traceparent 標頭（沒有時自動產生），並透過回應標頭 X-Trace-Id 回傳。
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+import secrets
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+TRACEPARENT_PATTERN = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+EXPORT_BATCH_SIZE = 512
+
+
+@dataclass
+class Span:
+    trace_id: str
+    name: str
+    span_id: str = field(default_factory=lambda: secrets.token_hex(8))
+    parent_id: Optional[str] = None
+    start: float = field(default_factory=time.time)
+    end: Optional[float] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    def finish(self, end: Optional[float] = None) -> None:
+        self.end = end if end is not None else time.time()
+        exporter.export(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": round((self.end - self.start) * 1000, 3) if self.end is not None else None,
+            "attributes": self.attributes,
+            "error": self.error
+        }
+
+
+current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+_root_start: ContextVar[Optional[float]] = ContextVar("root_start", default=None)
+
+
+def current_trace_id() -> Optional[str]:
+    span = current_span.get()
+    return span.trace_id if span else None
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """
+    在目前的追蹤中建立子 span；不在請求追蹤範圍內或追蹤關閉時不做任何事
+    """
+    parent = current_span.get()
+    if parent is None or not exporter.enabled:
+        yield None
+        return
+
+    child = Span(trace_id=parent.trace_id, name=name, parent_id=parent.span_id, attributes=attributes)
+    token = current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current_span.reset(token)
+        child.finish()
+
+
+def record_span(name: str, start: float, **attributes: Any) -> None:
+    """
+    補記一段已經結束的區間（例如 FastAPI 在進入端點前解析 multipart 的時間）
+    """
+    parent = current_span.get()
+    if parent is None or not exporter.enabled:
+        return
+    Span(
+        trace_id=parent.trace_id, name=name, parent_id=parent.span_id, start=start, attributes=attributes
+    ).finish()
+
+
+def request_start() -> Optional[float]:
+    """目前請求根 span 的開始時間"""
+    return _root_start.get()
+
+
+class SpanExporter:
+    """
+    非同步批次匯出：span 結束時只放入佇列，由背景工作定期寫出
+
+    mode 為 file 時以 JSONL 附加寫入 path，collector 時以 JSON 陣列 POST 到 url，none 時不匯出
+    （仍會產生追蹤 ID 並回傳在回應標頭）；enabled 為 False 時完全關閉追蹤。
+    """
+
+    def __init__(
+        self,
+        mode: str = "none",
+        path: Optional[str] = None,
+        url: Optional[str] = None,
+        interval: float = 1.0,
+        max_queue: int = 10000,
+        enabled: bool = True
+    ):
+        self.enabled = enabled
+        self.mode = mode
+        self.path = path
+        self.url = url
+        self.interval = interval
+        self.queue: Deque[Span] = deque(maxlen=max_queue)
+        self.task: Optional[asyncio.Task] = None
+        self.http_client: Optional[httpx.AsyncClient] = None
+        self.exported = 0
+        self.failed = 0
+
+    def export(self, span_: Span) -> None:
+        if self.mode != "none":
+            self.queue.append(span_)
+
+    def start(self) -> None:
+        if self.mode != "none" and self.task is None:
+            if self.mode == "collector":
+                self.http_client = httpx.AsyncClient(timeout=5.0)
+            self.task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    def _take_batch(self) -> List[Dict[str, Any]]:
+        batch = []
+        while self.queue and len(batch) < EXPORT_BATCH_SIZE:
+            batch.append(self.queue.popleft().to_dict())
+        return batch
+
+    async def flush(self) -> None:
+        while self.queue:
+            batch = self._take_batch()
+            try:
+                if self.mode == "file":
+                    await asyncio.to_thread(self._write_file, batch)
+                elif self.mode == "collector":
+                    response = await self.http_client.post(self.url, json={"spans": batch})
+                    response.raise_for_status()
+                self.exported += len(batch)
+            except Exception as e:
+                self.failed += len(batch)
+                logger.warning(f"匯出追蹤資料失敗: {e}")
+
+    def _write_file(self, batch: List[Dict[str, Any]]) -> None:
+        with open(self.path, "a", encoding="utf-8") as trace_file:
+            for item in batch:
+                trace_file.write(json.dumps(item, ensure_ascii=False) + "\n")
+
+    async def close(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        await self.flush()
+        if self.http_client is not None:
+            await self.http_client.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"mode": self.mode, "queued": len(self.queue), "exported": self.exported, "failed": self.failed}
+
+
+def exporter_from_env() -> SpanExporter:
+    return SpanExporter(
+        mode=os.getenv("TRACE_EXPORT", "none"),
+        path=os.getenv("TRACE_FILE", "traces.jsonl"),
+        url=os.getenv("TRACE_COLLECTOR_URL") or None,
+        interval=float(os.getenv("TRACE_EXPORT_INTERVAL", "1.0")),
+        enabled=os.getenv("TRACE_ENABLED", "true").lower() == "true"
+    )
+
+
+exporter = exporter_from_env()
+
+
+class TracingMiddleware:
+    """
+    ASGI 中間件：為每個 HTTP 請求建立根 span，並在回應標頭加上追蹤 ID
+    """
+
+    def __init__(self, app, exclude_paths: Optional[List[str]] = None):
+        self.app = app
+        self.exclude_paths = set(exclude_paths or [])
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not exporter.enabled or scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        trace_id, parent_id = None, None
+        for name, value in scope["headers"]:
+            if name == b"traceparent":
+                match = TRACEPARENT_PATTERN.match(value.decode("latin-1").strip())
+                if match:
+                    trace_id, parent_id = match.groups()
+                break
+
+        root = Span(
+            trace_id=trace_id or secrets.token_hex(16),
+            name=f"{scope['method']} {scope['path']}",
+            parent_id=parent_id,
+            attributes={"http.method": scope["method"], "http.path": scope["path"]}
+        )
+
+        async def traced_send(message):
+            if message["type"] == "http.response.start":
+                root.attributes["http.status"] = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"x-trace-id", root.trace_id.encode("latin-1")))
+                headers.append((b"traceparent", f"00-{root.trace_id}-{root.span_id}-01".encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = current_span.set(root)
+        start_token = _root_start.set(root.start)
+        try:
+            await self.app(scope, receive, traced_send)
+        except BaseException as e:
+            root.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _root_start.reset(start_token)
+            current_span.reset(token)
+            root.finish()
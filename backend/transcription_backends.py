@@ -0,0 +1,351 @@
+"""
+轉錄後端：OpenAI Whisper API 與本機 CPU 推論（faster-whisper / CTranslate2）
+"""
+import asyncio
+import logging
+import os
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+import audio_processing
+from micro_batching import MicroBatcher
+
+try:
+    from faster_whisper import WhisperModel
+    from faster_whisper.tokenizer import Tokenizer
+except ImportError:  # 本機後端為可選功能
+    WhisperModel = None
+    Tokenizer = None
+
+logger = logging.getLogger(__name__)
+
+LOCAL_SAMPLE_RATE = 16000
+WHISPER_WINDOW_SAMPLES = 30 * LOCAL_SAMPLE_RATE  # Whisper 編碼器固定處理 30 秒視窗
+WHISPER_MAX_DECODE_TOKENS = 224
+
+
+class TranscriptionBackend:
+    """
+    轉錄後端介面
+
+    transcribe() 的回傳格式與 Whisper API 相同：
+    response_format 為 text 時回傳字串，verbose_json 時回傳含 text / language / duration / segments 的 dict。
+    """
+
+    name = ""
+
+    @property
+    def model_id(self) -> str:
+        """用於轉錄快取鍵的模型識別，不同後端的結果不會互相命中"""
+        raise NotImplementedError
+
+    @property
+    def available(self) -> bool:
+        """後端所需的套件是否已安裝"""
+        return True
+
+    async def load(self) -> None:
+        """載入模型（需要時）"""
+
+    async def transcribe(self, content: bytes, suffix: str, response_format: str, language: str) -> Any:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        """釋放資源"""
+
+    def stats(self) -> Dict[str, Any]:
+        return {"model": self.model_id}
+
+
+class OpenAIWhisperBackend(TranscriptionBackend):
+    """
+    透過 OpenAI API 呼叫 Whisper
+    """
+
+    name = "openai"
+
+    def __init__(self, client, model: str):
+        self.client = client
+        self.model = model
+
+    @property
+    def model_id(self) -> str:
+        return self.model
+
+    async def transcribe(self, content: bytes, suffix: str, response_format: str, language: str) -> Any:
+        # 直接以記憶體中的內容上傳，檔名副檔名讓 Whisper 判斷音訊格式
+        transcript = await self.client.audio.transcriptions.create(
+            model=self.model,
+            file=(f"audio{suffix}", content),
+            response_format=response_format,
+            language=language
+        )
+        return transcript if isinstance(transcript, str) else transcript.model_dump()
+
+
+# 推論工作程序：每個程序在啟動時載入一次模型
+_worker_model = None
+
+
+def _init_worker(options: Dict[str, Any]) -> None:
+    global _worker_model
+    _worker_model = WhisperModel(device="cpu", num_workers=1, **options)
+
+
+def _worker_ready() -> bool:
+    return _worker_model is not None
+
+
+def _worker_transcribe(samples: np.ndarray, language: str, beam_size: int) -> Dict[str, Any]:
+    segments, info = _worker_model.transcribe(samples, language=language, beam_size=beam_size)
+    return format_local_result(list(segments), info.language, len(samples) / LOCAL_SAMPLE_RATE)
+
+
+def _worker_transcribe_batch(batch: List[np.ndarray], language: str, beam_size: int) -> List[str]:
+    """
+    將多個不超過 30 秒的片段補零到 30 秒視窗，一次編碼與解碼整批
+    """
+    model = _worker_model
+    features = np.stack([
+        model.feature_extractor(np.pad(samples, (0, WHISPER_WINDOW_SAMPLES - len(samples))), padding=0)
+        [:, :model.feature_extractor.nb_max_frames]
+        for samples in batch
+    ])
+    tokenizer = Tokenizer(
+        model.hf_tokenizer, model.model.is_multilingual, task="transcribe", language=language
+    )
+    prompt = model.get_prompt(tokenizer, [], without_timestamps=True)
+    encoder_output = model.encode(features)
+    results = model.model.generate(
+        encoder_output,
+        [prompt] * len(batch),
+        beam_size=beam_size,
+        max_length=WHISPER_MAX_DECODE_TOKENS,
+        suppress_blank=True
+    )
+    # 依輸入順序拆回各片段的文字
+    return [
+        tokenizer.decode([token for token in result.sequences_ids[0] if token < tokenizer.eot]).strip()
+        for result in results
+    ]
+
+
+class LocalWhisperBackend(TranscriptionBackend):
+    """
+    以 faster-whisper（CTranslate2）在本機 CPU 上推論
+
+    模型只載入一次，由固定大小的執行緒池共用；CTranslate2 推論時會釋放 GIL，
+    num_workers 讓同一模型可同時處理多個請求。
+
+    batch_size 大於 1 時改用程序池：不超過 30 秒的片段經微批次排程湊批，
+    以補零後的整批特徵一次推論，較長的音訊則直接交給程序池逐一轉錄。
+    """
+
+    name = "local"
+
+    def __init__(
+        self,
+        model_size: str = "small",
+        compute_type: str = "int8",
+        workers: int = 2,
+        cpu_threads: int = 0,
+        beam_size: int = 5,
+        download_root: Optional[str] = None,
+        batch_size: int = 1,
+        batch_window_ms: float = 20,
+        processes: int = 1
+    ):
+        self.model_size = model_size
+        self.compute_type = compute_type
+        self.workers = max(1, workers)
+        self.cpu_threads = cpu_threads
+        self.beam_size = beam_size
+        self.download_root = download_root
+        self.batch_size = batch_size
+        self.processes = max(1, processes)
+        self.model = None
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="local-whisper")
+        self.process_pool: Optional[ProcessPoolExecutor] = None
+        self.batcher: Optional[MicroBatcher] = None
+        if self.batch_size > 1:
+            self.batcher = MicroBatcher(
+                self._run_batch,
+                max_batch_size=batch_size,
+                max_wait_ms=batch_window_ms,
+                max_inflight_batches=self.processes
+            )
+        self.load_lock = asyncio.Lock()
+        self.load_seconds: Optional[float] = None
+        self.requests = 0
+        self.inference_seconds = 0.0
+
+    @property
+    def model_id(self) -> str:
+        return f"local:{self.model_size}:{self.compute_type}"
+
+    @property
+    def available(self) -> bool:
+        return WhisperModel is not None
+
+    @property
+    def loaded(self) -> bool:
+        return self.process_pool is not None if self.batcher else self.model is not None
+
+    def _model_options(self) -> Dict[str, Any]:
+        return {
+            "model_size_or_path": self.model_size,
+            "compute_type": self.compute_type,
+            "cpu_threads": self.cpu_threads,
+            "download_root": self.download_root
+        }
+
+    async def load(self) -> None:
+        if self.loaded:
+            return
+        if WhisperModel is None:
+            raise RuntimeError("本機轉錄後端需要安裝 faster-whisper")
+
+        async with self.load_lock:
+            if self.loaded:
+                return
+            started = time.perf_counter()
+            loop = asyncio.get_running_loop()
+            if self.batcher:
+                # 以 spawn 啟動工作程序，避免 fork 複製事件迴圈與推論執行緒的狀態
+                pool = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self._model_options(),)
+                )
+                # 每個程序各送一個空工作，讓模型在第一個請求前就載入完成
+                await asyncio.gather(*(
+                    loop.run_in_executor(pool, _worker_ready) for _ in range(self.processes)
+                ))
+                self.process_pool = pool
+            else:
+                self.model = await loop.run_in_executor(self.executor, self._load_model)
+            self.load_seconds = time.perf_counter() - started
+            logger.info(f"本機 Whisper 模型 {self.model_size} ({self.compute_type}) 載入完成，耗時 {self.load_seconds:.1f} 秒")
+
+    def _load_model(self):
+        return WhisperModel(device="cpu", num_workers=self.workers, **self._model_options())
+
+    async def transcribe(self, content: bytes, suffix: str, response_format: str, language: str) -> Any:
+        await self.load()
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        if self.batcher:
+            samples, _ = await loop.run_in_executor(
+                self.executor, audio_processing.decode_audio, content, LOCAL_SAMPLE_RATE
+            )
+            if len(samples) <= WHISPER_WINDOW_SAMPLES:
+                text = await self.batcher.submit((samples, language))
+                duration = len(samples) / LOCAL_SAMPLE_RATE
+                result = {
+                    "task": "transcribe",
+                    "language": language,
+                    "duration": duration,
+                    "text": text,
+                    "segments": [{"id": 0, "start": 0.0, "end": duration, "text": text}] if text else []
+                }
+            else:
+                result = await loop.run_in_executor(
+                    self.process_pool, _worker_transcribe, samples, language, self.beam_size
+                )
+        else:
+            result = await loop.run_in_executor(self.executor, self._transcribe, content, language)
+        self.requests += 1
+        self.inference_seconds += time.perf_counter() - started
+        return result["text"] if response_format == "text" else result
+
+    def _transcribe(self, content: bytes, language: str) -> Dict[str, Any]:
+        samples, sample_rate = audio_processing.decode_audio(content, LOCAL_SAMPLE_RATE)
+        segments, info = self.model.transcribe(samples, language=language, beam_size=self.beam_size)
+        # segments 為產生器，需在工作執行緒內逐段取出才會實際推論
+        return format_local_result(list(segments), info.language, len(samples) / sample_rate)
+
+    async def _run_batch(self, items: List[Any]) -> List[str]:
+        """
+        同一批內語言相同時一起推論；語言不同時依語言分組
+        """
+        loop = asyncio.get_running_loop()
+        results: List[Optional[str]] = [None] * len(items)
+        groups: Dict[str, List[int]] = {}
+        for index, (_, language) in enumerate(items):
+            groups.setdefault(language, []).append(index)
+        for language, indexes in groups.items():
+            texts = await loop.run_in_executor(
+                self.process_pool,
+                _worker_transcribe_batch,
+                [items[index][0] for index in indexes],
+                language,
+                self.beam_size
+            )
+            for index, text in zip(indexes, texts):
+                results[index] = text
+        return results
+
+    async def close(self) -> None:
+        if self.batcher:
+            await self.batcher.close()
+        if self.process_pool is not None:
+            self.process_pool.shutdown(wait=False, cancel_futures=True)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "model": self.model_id,
+            "available": self.available,
+            "loaded": self.loaded,
+            "load_seconds": self.load_seconds,
+            "workers": self.workers,
+            "processes": self.processes if self.batcher else 0,
+            "batching": self.batcher.stats() if self.batcher else None,
+            "requests": self.requests,
+            "inference_seconds": round(self.inference_seconds, 3)
+        }
+
+
+def format_local_result(segments: list, language: str, duration: float) -> Dict[str, Any]:
+    """
+    將 faster-whisper 的片段轉成 Whisper API verbose_json 的格式
+    """
+    formatted = [
+        {
+            "id": index,
+            "start": segment.start,
+            "end": segment.end,
+            "text": segment.text.strip(),
+            "avg_logprob": segment.avg_logprob,
+            "no_speech_prob": segment.no_speech_prob,
+            "compression_ratio": segment.compression_ratio
+        }
+        for index, segment in enumerate(segments)
+    ]
+    return {
+        "task": "transcribe",
+        "language": language,
+        "duration": duration,
+        # 空格分隔的語言片段文字自帶前導空白，直接串接即可
+        "text": "".join(segment.text for segment in segments).strip(),
+        "segments": formatted
+    }
+
+
+def local_backend_from_env() -> LocalWhisperBackend:
+    return LocalWhisperBackend(
+        model_size=os.getenv("LOCAL_WHISPER_MODEL", "small"),
+        compute_type=os.getenv("LOCAL_WHISPER_COMPUTE_TYPE", "int8"),
+        workers=int(os.getenv("LOCAL_WHISPER_WORKERS", "2")),
+        cpu_threads=int(os.getenv("LOCAL_WHISPER_CPU_THREADS", "0")),
+        beam_size=int(os.getenv("LOCAL_WHISPER_BEAM_SIZE", "5")),
+        download_root=os.getenv("LOCAL_WHISPER_MODEL_DIR") or None,
+        batch_size=int(os.getenv("LOCAL_WHISPER_BATCH_SIZE", "1")),
+        batch_window_ms=float(os.getenv("LOCAL_WHISPER_BATCH_WINDOW_MS", "20")),
+        processes=int(os.getenv("LOCAL_WHISPER_PROCESSES", "1"))
+    )
@@ -0,0 +1,110 @@
+"""
+上傳大小限制：在讀取請求本文時即時檢查大小，超過上限立即中止
+"""
+import json
+from typing import Dict, Tuple
+
+from fastapi import HTTPException, UploadFile
+
+UPLOAD_READ_CHUNK_SIZE = 1024 * 1024
+MULTIPART_OVERHEAD_BYTES = 64 * 1024  # multipart 邊界與表單欄位的額外空間
+
+
+class UploadSizeLimitMiddleware:
+    """
+    ASGI 中間件：依路徑限制請求本文大小
+
+    先檢查 Content-Length，超過上限直接拒絕而不讀取本文；
+    沒有 Content-Length（chunked）時則在串流接收時累計位元組數，
+    一旦超過上限就停止接收並以 400 回應。
+    """
+
+    def __init__(self, app, limits: Dict[str, Tuple[int, str]]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.limits:
+            await self.app(scope, receive, send)
+            return
+
+        max_bytes, detail = self.limits[scope["path"]]
+        allowed_bytes = max_bytes + MULTIPART_OVERHEAD_BYTES
+
+        for name, value in scope["headers"]:
+            if name == b"content-length":
+                try:
+                    content_length = int(value)
+                except ValueError:
+                    content_length = 0
+                if content_length > allowed_bytes:
+                    await self.reject(send, detail)
+                    return
+                break
+
+        received_bytes = 0
+        exceeded = False
+        response_sent = False
+
+        async def limited_receive():
+            nonlocal received_bytes, exceeded
+            if exceeded:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received_bytes += len(message.get("body", b""))
+                if received_bytes > allowed_bytes:
+                    exceeded = True
+                    # 以中斷連線通知應用程式停止讀取本文
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            nonlocal response_sent
+            if exceeded:
+                # 以大小限制錯誤取代應用程式因本文中斷產生的回應
+                if not response_sent:
+                    response_sent = True
+                    await self.reject(send, detail)
+                return
+            response_sent = True
+            await send(message)
+
+        await self.app(scope, limited_receive, guarded_send)
+
+        if exceeded and not response_sent:
+            await self.reject(send, detail)
+
+    @staticmethod
+    async def reject(send, detail: str) -> None:
+        body = json.dumps({"detail": detail}, ensure_ascii=False).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 400,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                (b"connection", b"close")
+            ]
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+async def read_upload(file: UploadFile, max_bytes: int, detail: str) -> bytes:
+    """
+    分塊讀取上傳檔案，超過上限時立即中止
+    """
+    if file.size is not None and file.size > max_bytes:
+        raise HTTPException(status_code=400, detail=detail)
+
+    chunks = []
+    total = 0
+    while True:
+        chunk = await file.read(UPLOAD_READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        total += len(chunk)
+        if total > max_bytes:
+            raise HTTPException(status_code=400, detail=detail)
+        chunks.append(chunk)
+    return b"".join(chunks)
@@ -0,0 +1,209 @@
+"""
+離線簡體轉繁體中文轉換
+
+以內建的字元對照表與詞組對照表進行最長詞組優先匹配，不需要網路呼叫。
+可透過 ZH_CONVERT_DICT_DIR 載入 OpenCC 格式的字典檔（STCharacters.txt、STPhrases.txt）擴充對照表。
+"""
+import logging
+import os
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 一對一的簡繁字元對照（每組為「簡繁」兩個字）
+_CHARACTERS = """
+    爱愛 碍礙 肮骯 袄襖 坝壩 罢罷 摆擺 败敗 颁頒 办辦 绊絆 帮幫 绑綁 镑鎊 谤謗 宝寶 报報 饱飽 鲍鮑 辈輩
+    贝貝 备備 惫憊 笔筆 毕畢 币幣 闭閉 边邊 编編 贬貶 变變 辩辯 辫辮 标標 鳖鱉 别別 宾賓 滨濱 饼餅 拨撥
+    钵缽 驳駁 补補 财財 参參 蚕蠶 残殘 惭慚 惨慘 灿燦 仓倉 苍蒼 舱艙 厕廁 侧側 测測 层層 诧詫 搀攙 馋饞
+    缠纏 产產 阐闡 颤顫 长長 尝嘗 肠腸 偿償 厂廠 畅暢 钞鈔 车車 彻徹 尘塵 陈陳 衬襯 称稱 惩懲 诚誠 骋騁
+    痴癡 迟遲 驰馳 耻恥 齿齒 炽熾 冲衝 虫蟲 宠寵 筹籌 踌躊 丑醜 橱櫥 厨廚 锄鋤 础礎 储儲 触觸 处處 传傳
+    疮瘡 闯闖 创創 锤錘 纯純 绰綽 辞辭 词詞 赐賜 聪聰 葱蔥 从從 丛叢 凑湊 窜竄 错錯 达達 带帶 贷貸 担擔
+    单單 胆膽 惮憚 诞誕 弹彈 当當 挡擋 党黨 荡蕩 档檔 导導 岛島 祷禱 盗盜 灯燈 邓鄧 敌敵 涤滌 递遞 缔締
+    点點 垫墊 电電 淀澱 钓釣 调調 谍諜 叠疊 钉釘 顶頂 订訂 东東 动動 栋棟 冻凍 犊犢 独獨 读讀 赌賭 镀鍍
+    锻鍛 断斷 缎緞 队隊 对對 吨噸 顿頓 钝鈍 夺奪 堕墮 鹅鵝 额額 讹訛 恶惡 饿餓 儿兒 尔爾 饵餌 贰貳 发發
+    罚罰 阀閥 范範 贩販 饭飯 访訪 纺紡 飞飛 废廢 费費 纷紛 坟墳 奋奮 愤憤 粪糞 丰豐 枫楓 锋鋒 风風 疯瘋
+    冯馮 缝縫 讽諷 凤鳳 肤膚 辐輻 抚撫 辅輔 赋賦 复復 负負 讣訃 妇婦 缚縛 该該 钙鈣 盖蓋 赶趕 秆稈 赣贛
+    冈岡 刚剛 钢鋼 纲綱 岗崗 镐鎬 搁擱 鸽鴿 阁閣 个個 给給 龚龔 巩鞏 贡貢 钩鉤 沟溝 构構 购購 够夠 蛊蠱
+    顾顧 关關 观觀 馆館 惯慣 贯貫 广廣 规規 归歸 龟龜 闺閨 轨軌 诡詭 贵貴 刽劊 滚滾 锅鍋 国國 过過 骇駭
+    韩韓 汉漢 号號 阂閡 鹤鶴 贺賀 横橫 轰轟 鸿鴻 红紅 后後 壶壺 护護 沪滬 户戶 哗嘩 华華 画畫 划劃 话話
+    怀懷 坏壞 欢歡 环環 还還 缓緩 换換 唤喚 痪瘓 焕煥 涣渙 谎謊 挥揮 辉輝 毁毀 贿賄 秽穢 会會 烩燴 汇匯
+    讳諱 诲誨 绘繪 荤葷 浑渾 获獲 货貨 祸禍 击擊 机機 积積 饥饑 迹跡 讥譏 鸡雞 绩績 缉緝 极極 辑輯 级級
+    挤擠 几幾 蓟薊 剂劑 济濟 计計 记記 际際 继繼 纪紀 夹夾 荚莢 颊頰 贾賈 钾鉀 价價 驾駕 歼殲 监監 坚堅
+    笺箋 间間 艰艱 缄緘 茧繭 检檢 碱鹼 拣揀 捡撿 简簡 俭儉 减減 荐薦 槛檻 鉴鑒 践踐 贱賤 见見 键鍵 舰艦
+    剑劍 饯餞 渐漸 溅濺 涧澗 将將 浆漿 蒋蔣 桨槳 奖獎 讲講 酱醬 胶膠 浇澆 骄驕 娇嬌 搅攪 铰鉸 矫矯 侥僥
+    脚腳 饺餃 缴繳 绞絞 轿轎 较較 阶階 节節 洁潔 结結 诫誡 届屆 紧緊 锦錦 仅僅 谨謹 进進 晋晉 烬燼 尽盡
+    劲勁 荆荊 茎莖 惊驚 经經 颈頸 镜鏡 径徑 痉痙 竞競 净淨 纠糾 厩廄 旧舊 驹駒 举舉 据據 锯鋸 惧懼 剧劇
+    鹃鵑 绢絹 觉覺 决決 诀訣 绝絕 钧鈞 军軍 骏駿 开開 凯凱 颗顆 壳殼 课課 垦墾 恳懇 抠摳 库庫 裤褲 夸誇
+    块塊 侩儈 宽寬 矿礦 旷曠 况況 亏虧 岿巋 窥窺 馈饋 溃潰 扩擴 阔闊 蜡蠟 腊臘 莱萊 来來 赖賴 蓝藍 栏欄
+    拦攔 篮籃 阑闌 兰蘭 澜瀾 谰讕 揽攬 览覽 懒懶 缆纜 烂爛 滥濫 劳勞 涝澇 乐樂 镭鐳 垒壘 类類 泪淚 篱籬
+    离離 里裡 鲤鯉 礼禮 丽麗 厉厲 励勵 砾礫 历歷 沥瀝 隶隸 俩倆 联聯 莲蓮 连連 镰鐮 怜憐 涟漣 帘簾 敛斂
+    脸臉 链鏈 恋戀 炼煉 练練 粮糧 凉涼 两兩 辆輛 谅諒 疗療 辽遼 镣鐐 猎獵 临臨 邻鄰 鳞鱗 凛凜 赁賃 龄齡
+    铃鈴 灵靈 岭嶺 领領 馏餾 刘劉 龙龍 聋聾 咙嚨 笼籠 垄壟 拢攏 陇隴 楼樓 娄婁 搂摟 篓簍 芦蘆 卢盧 颅顱
+    庐廬 炉爐 掳擄 卤滷 虏虜 鲁魯 赂賂 禄祿 录錄 陆陸 驴驢 吕呂 铝鋁 侣侶 屡屢 缕縷 虑慮 滤濾 绿綠 峦巒
+    挛攣 孪孿 乱亂 抡掄 轮輪 伦倫 仑崙 沦淪 纶綸 论論 萝蘿 罗羅 逻邏 锣鑼 箩籮 骡騾 骆駱 络絡 妈媽 玛瑪
+    码碼 蚂螞 马馬 骂罵 吗嗎 买買 麦麥 卖賣 迈邁 脉脈 瞒瞞 馒饅 蛮蠻 满滿 谩謾 猫貓 锚錨 铆鉚 贸貿 么麼
+    没沒 镁鎂 门門 闷悶 们們 锰錳 梦夢 谜謎 弥彌 觅覓 幂冪 绵綿 缅緬 庙廟 灭滅 悯憫 闽閩 鸣鳴 铭銘 谬謬
+    谋謀 亩畝 钠鈉 纳納 难難 挠撓 脑腦 恼惱 闹鬧 馁餒 腻膩 撵攆 酿釀 鸟鳥 聂聶 啮齧 镊鑷 镍鎳 柠檸 狞獰
+    宁寧 拧擰 泞濘 钮鈕 纽紐 脓膿 浓濃 农農 疟瘧 诺諾 欧歐 鸥鷗 殴毆 呕嘔 沤漚 盘盤 庞龐 赔賠 喷噴 鹏鵬
+    骗騙 飘飄 频頻 贫貧 苹蘋 凭憑 评評 泼潑 颇頗 扑撲 铺鋪 朴樸 谱譜 栖棲 凄淒 脐臍 齐齊 骑騎 岂豈 启啟
+    气氣 弃棄 讫訖 牵牽 铅鉛 迁遷 签簽 谦謙 钱錢 钳鉗 潜潛 浅淺 谴譴 堑塹 枪槍 呛嗆 墙牆 蔷薔 强強 抢搶
+    锹鍬 桥橋 乔喬 侨僑 翘翹 窍竅 窃竊 钦欽 亲親 寝寢 轻輕 氢氫 倾傾 顷頃 请請 庆慶 琼瓊 穷窮 趋趨 区區
+    躯軀 驱驅 龋齲 颧顴 权權 劝勸 却卻 鹊鵲 确確 让讓 饶饒 扰擾 绕繞 热熱 韧韌 认認 纫紉 荣榮 绒絨 软軟
+    锐銳 闰閏 润潤 洒灑 萨薩 鳃鰓 赛賽 伞傘 丧喪 骚騷 扫掃 涩澀 杀殺 纱紗 筛篩 晒曬 闪閃 陕陝 赡贍 缮繕
+    伤傷 赏賞 烧燒 绍紹 赊賒 舍捨 摄攝 慑懾 设設 绅紳 审審 婶嬸 肾腎 渗滲 声聲 绳繩 胜勝 圣聖 师師 狮獅
+    湿濕 诗詩 尸屍 时時 蚀蝕 实實 识識 驶駛 势勢 适適 释釋 饰飾 视視 试試 寿壽 兽獸 枢樞 输輸 书書 赎贖
+    属屬 术術 树樹 竖豎 数數 帅帥 双雙 谁誰 税稅 顺順 说說 硕碩 烁爍 丝絲 饲飼 耸聳 怂慫 颂頌 讼訟 诵誦
+    擞擻 苏蘇 诉訴 肃肅 虽雖 随隨 岁歲 孙孫 损損 笋筍 缩縮 琐瑣 锁鎖 獭獺 挞撻 态態 摊攤 贪貪 瘫癱 滩灘
+    坛壇 谭譚 谈談 叹嘆 汤湯 烫燙 涛濤 讨討 腾騰 誊謄 锑銻 题題 体體 屉屜 条條 贴貼 铁鐵 厅廳 听聽 烃烴
+    铜銅 统統 头頭 秃禿 图圖 涂塗 团團 颓頹 蜕蛻 脱脫 鸵鴕 驮馱 驼駝 椭橢 洼窪 袜襪 弯彎 湾灣 顽頑 万萬
+    网網 韦韋 违違 围圍 为為 潍濰 维維 苇葦 伟偉 伪偽 纬緯 谓謂 卫衛 温溫 闻聞 纹紋 稳穩 问問 瓮甕 挝撾
+    蜗蝸 涡渦 窝窩 卧臥 呜嗚 钨鎢 乌烏 诬誣 无無 芜蕪 吴吳 坞塢 雾霧 务務 误誤 锡錫 牺犧 袭襲 习習 铣銑
+    戏戲 细細 虾蝦 辖轄 峡峽 侠俠 狭狹 厦廈 吓嚇 鲜鮮 纤纖 咸鹹 贤賢 衔銜 闲閒 显顯 险險 现現 献獻 县縣
+    馅餡 羡羨 宪憲 线線 厢廂 镶鑲 乡鄉 详詳 响響 项項 萧蕭 嚣囂 销銷 晓曉 啸嘯 协協 挟挾 携攜 胁脅 谐諧
+    写寫 泻瀉 谢謝 锌鋅 衅釁 兴興 汹洶 锈鏽 绣繡 须須 虚虛 嘘噓 许許 叙敘 绪緒 续續 轩軒 悬懸 选選 癣癬
+    绚絢 学學 勋勳 询詢 寻尋 驯馴 训訓 讯訊 逊遜 压壓 鸦鴉 鸭鴨 哑啞 亚亞 讶訝 阉閹 烟煙 盐鹽 严嚴 颜顏
+    阎閻 艳艷 厌厭 砚硯 彦彥 谚諺 验驗 鸯鴦 杨楊 扬揚 疡瘍 阳陽 痒癢 养養 样樣 钥鑰 药藥 尧堯 摇搖 遥遙
+    窑窯 谣謠 爷爺 页頁 业業 叶葉 医醫 铱銥 颐頤 遗遺 仪儀 蚁蟻 艺藝 亿億 忆憶 义義 谊誼 译譯 异異 绎繹
+    荫蔭 阴陰 银銀 饮飲 隐隱 樱櫻 婴嬰 鹰鷹 应應 缨纓 莹瑩 萤螢 营營 荧熒 蝇蠅 赢贏 颖穎 哟喲 拥擁 佣傭
+    痈癰 踊踴 咏詠 涌湧 优優 忧憂 邮郵 铀鈾 犹猶 诱誘 于於 舆輿 余餘 鱼魚 渔漁 娱娛 与與 屿嶼 语語 吁籲
+    狱獄 誉譽 预預 驭馭 鸳鴛 渊淵 辕轅 园園 员員 圆圓 缘緣 远遠 愿願 约約 跃躍 粤粵 悦悅 阅閱 云雲 郧鄖
+    匀勻 陨隕 运運 蕴蘊 酝醞 晕暈 韵韻 杂雜 灾災 载載 攒攢 暂暫 赞讚 赃贓 脏髒 凿鑿 枣棗 灶竈 责責 择擇
+    则則 泽澤 贼賊 赠贈 轧軋 铡鍘 闸閘 诈詐 斋齋 债債 毡氈 盏盞 斩斬 辗輾 崭嶄 栈棧 战戰 绽綻 张張 涨漲
+    帐帳 账賬 胀脹 赵趙 蛰蟄 辙轍 锗鍺 这這 贞貞 针針 侦偵 诊診 镇鎮 阵陣 挣掙 睁睜 狰猙 争爭 帧幀 郑鄭
+    证證 织織 职職 执執 纸紙 挚摯 掷擲 帜幟 质質 滞滯 钟鐘 终終 种種 肿腫 众眾 诌謅 轴軸 皱皺 昼晝 骤驟
+    猪豬 诸諸 诛誅 烛燭 瞩矚 嘱囑 贮貯 铸鑄 筑築 驻駐 专專 砖磚 转轉 赚賺 桩樁 庄莊 装裝 妆妝 壮壯 状狀
+    锥錐 赘贅 坠墜 缀綴 谆諄 准準 浊濁 兹茲 资資 渍漬 踪蹤 综綜 总總 纵縱 邹鄒 诅詛 组組 钻鑽 亵褻 着著
+    丢丟 册冊 删刪 刹剎 呐吶 啰囉 场場 杰傑 柜櫃 毙斃 浏瀏 潇瀟 玺璽 珐琺 禅禪 稣穌 昙曇 眯瞇 雏雛 捞撈
+    捣搗 掺摻 撑撐 榄欖 棱稜 狈狽 牍牘 议議 挂掛
+"""
+
+# 一簡對多繁的字需要依詞組判斷（每組為「簡體詞 繁體詞」）
+_PHRASES = """
+    头发 頭髮  理发 理髮  发型 髮型  白发 白髮  短发 短髮  长发 長髮
+    发夹 髮夾  假发 假髮  面条 麵條  面包 麵包  面粉 麵粉  拉面 拉麵
+    方便面 方便麵  面食 麵食  关系 關係  没关系 沒關係  联系 聯繫  维系 維繫
+    干净 乾淨  干燥 乾燥  饼干 餅乾  干杯 乾杯  干脆 乾脆  晒干 曬乾
+    干部 幹部  干活 幹活  能干 能幹  干什么 幹什麼  干嘛 幹嘛  骨干 骨幹
+    树干 樹幹  主干 主幹  干练 幹練  复杂 複雜  复制 複製  重复 重複
+    复习 複習  复数 複數  复印 複印  复合 複合  日历 日曆  历法 曆法
+    农历 農曆  阳历 陽曆  词汇 詞彙  汇总 彙總  汇编 彙編  收获 收穫
+    划船 划船  划算 划算  划不来 划不來  战斗 戰鬥  奋斗 奮鬥  斗争 鬥爭
+    斗志 鬥志  搏斗 搏鬥  冲洗 沖洗  冲泡 沖泡  放松 放鬆  轻松 輕鬆
+    松开 鬆開  宽松 寬鬆  松懈 鬆懈  胡须 鬍鬚  胡子 鬍子  茶几 茶几
+    公里 公里  里程 里程  千里 千里  邻里 鄰里  故里 故里  皇后 皇后
+    王后 王后  太后 太后  后妃 后妃  宿舍 宿舍  校舍 校舍  心脏 心臟
+    内脏 內臟  肝脏 肝臟  脏器 臟器  钟情 鍾情  钟爱 鍾愛  批准 批准
+    准许 准許  尽管 儘管  尽量 儘量  尽快 儘快  尽早 儘早  佣金 佣金
+    赞成 贊成  赞助 贊助  标签 標籤  抽签 抽籤  书签 書籤  恶心 噁心
+    特征 特徵  象征 象徵  征求 徵求  征收 徵收  制造 製造  制作 製作
+    制品 製品  绘制 繪製  复制品 複製品  手表 手錶  钟表 鐘錶  老板 老闆
+    稻谷 稻穀  谷物 穀物  周末 週末  周年 週年  每周 每週  本周 本週
+    上周 上週  下周 下週  一周 一週  旅游 旅遊  游戏 遊戲  游览 遊覽
+    导游 導遊  防御 防禦  抵御 抵禦  伙伴 夥伴  合伙 合夥  一伙 一夥
+    刮风 颳風  台风 颱風  萝卜 蘿蔔  杂志 雜誌  标志 標誌  细致 細緻
+    占据 佔據  占领 佔領  占用 佔用  一只 一隻  两只 兩隻  船只 船隻
+    才干 才幹  沈阳 瀋陽
+"""
+
+
+class ChineseConverter:
+    """
+    簡體轉繁體轉換器
+
+    詞組以首字索引，轉換時在每個位置先嘗試最長的詞組，
+    沒有符合的詞組時才逐字查表；已經是繁體的文字會原樣保留。
+    """
+
+    def __init__(self, characters: Dict[str, str], phrases: Dict[str, str]):
+        self.characters = characters
+        self.phrases = phrases
+        # 首字 -> 以該字開頭的詞組長度（由長到短）
+        lengths_by_first: Dict[str, set] = {}
+        for phrase in phrases:
+            lengths_by_first.setdefault(phrase[0], set()).add(len(phrase))
+        self.phrase_lengths: Dict[str, List[int]] = {
+            first: sorted(lengths, reverse=True) for first, lengths in lengths_by_first.items()
+        }
+
+    def convert(self, text: str) -> str:
+        if not text:
+            return text
+
+        characters = self.characters
+        phrases = self.phrases
+        phrase_lengths = self.phrase_lengths
+        result = []
+        index = 0
+        length = len(text)
+        while index < length:
+            char = text[index]
+            lengths = phrase_lengths.get(char)
+            if lengths:
+                for size in lengths:
+                    if index + size <= length:
+                        converted = phrases.get(text[index:index + size])
+                        if converted is not None:
+                            result.append(converted)
+                            index += size
+                            break
+                else:
+                    result.append(characters.get(char, char))
+                    index += 1
+                continue
+            result.append(characters.get(char, char))
+            index += 1
+        return "".join(result)
+
+
+def _parse_characters(table: str) -> Dict[str, str]:
+    return {pair[0]: pair[1] for pair in table.split()}
+
+
+def _parse_phrases(table: str) -> Dict[str, str]:
+    tokens = table.split()
+    return dict(zip(tokens[::2], tokens[1::2]))
+
+
+def _load_opencc_dict(path: str) -> Dict[str, str]:
+    """
+    讀取 OpenCC 格式字典（每行「原文<TAB>候選1 候選2 ...」，取第一個候選）
+    """
+    mapping = {}
+    with open(path, encoding="utf-8") as dict_file:
+        for line in dict_file:
+            parts = line.rstrip("\n").split("\t")
+            if len(parts) == 2 and parts[1]:
+                mapping[parts[0]] = parts[1].split(" ")[0]
+    return mapping
+
+
+def build_converter(dict_dir: Optional[str] = None) -> ChineseConverter:
+    characters = _parse_characters(_CHARACTERS)
+    phrases = _parse_phrases(_PHRASES)
+
+    if dict_dir:
+        for file_name, target in (("STCharacters.txt", characters), ("STPhrases.txt", phrases)):
+            path = os.path.join(dict_dir, file_name)
+            if os.path.exists(path):
+                try:
+                    target.update(_load_opencc_dict(path))
+                except Exception as e:
+                    logger.warning(f"載入轉換字典失敗 {path}: {e}")
+
+    # 單字詞組放進字元表，詞組表只保留多字詞組
+    for phrase in [phrase for phrase in phrases if len(phrase) == 1]:
+        characters[phrase] = phrases.pop(phrase)
+    return ChineseConverter(characters, phrases)
+
+
+_converter: Optional[ChineseConverter] = None
+
+
+def to_traditional(text: str) -> str:
+    """
+    將簡體中文轉換為繁體中文
+    """
+    global _converter
+    if _converter is None:
+        _converter = build_converter(os.getenv("ZH_CONVERT_DICT_DIR") or None)
+    return _converter.convert(text)
@@ -1,7 +1,7 @@
 import React, { useState, useCallback, useEffect } from 'react';
 import { Mic, MicOff, Upload, Download, Trash2, Brain, Settings } from 'lucide-react';
 import { useAudioRecorder } from './hooks/useAudioRecorder';
-import { speechToTextAPI, TranscriptionResult } from './api';
+import { speechToTextAPI, TranscriptionResult, isMindmapUpgrade } from './api';
 import AudioVisualizer from './components/AudioVisualizer';
 import MindMap from './components/MindMap';
 
@@ -10,6 +10,7 @@ interface TranscriptionItem extends TranscriptionResult {
   timestamp: string;
   fileName?: string;
   showMindMap?: boolean;
+  mindmapStreaming?: boolean;
 }
 
 function App() {
@@ -47,6 +48,25 @@ function App() {
     return () => clearInterval(interval);
   }, [checkConnection]);
 
+  // 背景架構圖任務完成後補上架構圖（或將本機即時架構圖升級為 Gemini 架構圖）
+  const attachMindmapWhenReady = useCallback(async (id: string, jobId?: string | null) => {
+    if (!jobId) return;
+    try {
+      const mindmap = await speechToTextAPI.waitForMindmap(jobId);
+      if (mindmap) {
+        setTranscriptions(prev =>
+          prev.map(item =>
+            item.id === id && isMindmapUpgrade(item.mindmap, mindmap)
+              ? { ...item, mindmap }
+              : item
+          )
+        );
+      }
+    } catch (err) {
+      console.warn('架構圖任務查詢失敗:', err);
+    }
+  }, []);
+
   // 音訊錄製完成處理
   const handleRecordingComplete = useCallback(async (audioBlob: Blob) => {
     setIsProcessing(true);
@@ -64,13 +84,14 @@ function App() {
         };
         
         setTranscriptions(prev => [newTranscription, ...prev]);
+        attachMindmapWhenReady(newTranscription.id, result.mindmap_job_id);
       }
     } catch (err) {
       setError(err instanceof Error ? err.message : '轉錄失敗');
     } finally {
       setIsProcessing(false);
     }
-  }, []);
+  }, [attachMindmapWhenReady]);
 
   // 錄製錯誤處理
   const handleRecordingError = useCallback((errorMessage: string) => {
@@ -108,6 +129,7 @@ function App() {
         };
         
         setTranscriptions(prev => [newTranscription, ...prev]);
+        attachMindmapWhenReady(newTranscription.id, result.mindmap_job_id);
       }
     } catch (err) {
       setError(err instanceof Error ? err.message : '檔案轉錄失敗');
@@ -115,7 +137,7 @@ function App() {
       setIsProcessing(false);
       event.target.value = ''; // 重置檔案輸入
     }
-  }, []);
+  }, [attachMindmapWhenReady]);
 
   // 切換架構圖顯示
   const toggleMindMap = useCallback((id: string) => {
@@ -135,17 +157,27 @@ function App() {
 
     setIsProcessing(true);
     try {
-      const result = await speechToTextAPI.generateMindmap(transcription.text, selectedModel);
-      if (result.success) {
+      // 邊接收邊繪製，Gemini 生成完成前就能看到部分節點
+      const result = await speechToTextAPI.streamMindmap(transcription.text, selectedModel, (mermaidCode) => {
         setTranscriptions(prev =>
           prev.map(item =>
             item.id === id
-              ? { ...item, mindmap: result.mindmap }
+              ? { ...item, mindmap: { type: 'mermaid' as const, mermaid_code: mermaidCode }, mindmapStreaming: true }
               : item
           )
         );
-      }
+      });
+      setTranscriptions(prev =>
+        prev.map(item =>
+          item.id === id
+            ? { ...item, mindmap: result.mindmap, mindmapStreaming: false }
+            : item
+        )
+      );
     } catch (err) {
+      setTranscriptions(prev =>
+        prev.map(item => (item.id === id ? { ...item, mindmapStreaming: false } : item))
+      );
       setError(err instanceof Error ? err.message : '架構圖生成失敗');
     } finally {
       setIsProcessing(false);
@@ -357,8 +389,11 @@ function App() {
                   <h4 style={{ margin: '0 0 1rem 0', color: '#7c3aed', display: 'flex', alignItems: 'center', gap: '0.5rem' }}>
                     <Brain size={18} />
                     內容架構圖
+                    {item.mindmap.tier === 'local' && !item.mindmapStreaming && (
+                      <span style={{ fontSize: '0.75rem', color: '#9ca3af', fontWeight: 'normal' }}>快速預覽</span>
+                    )}
                   </h4>
-                  <MindMap data={item.mindmap} />
+                  <MindMap data={item.mindmap} streaming={item.mindmapStreaming} />
                 </div>
               )}
             </div>
@@ -5,6 +5,21 @@ const API_BASE_URL = 'http://localhost:8000';
 export interface MindMapData {
   type: "mermaid";
   mermaid_code: string;
+  // 來源層級：local（本機即時）、gemini（升級後）、fallback（Gemini 失敗時的靜態圖）
+  tier?: 'local' | 'gemini' | 'fallback';
+  // 即時架構圖版本，同一版本的 gemini 會取代 local，較舊版本的升級則丟棄
+  version?: number;
+}
+
+const MINDMAP_TIER_RANK = { fallback: 0, local: 1, gemini: 2 };
+
+// 判斷新收到的架構圖是否應取代目前顯示的架構圖
+export function isMindmapUpgrade(current: MindMapData | null | undefined, next: MindMapData): boolean {
+  if (!current) return true;
+  const currentVersion = current.version ?? 0;
+  const nextVersion = next.version ?? 0;
+  if (nextVersion !== currentVersion) return nextVersion > currentVersion;
+  return MINDMAP_TIER_RANK[next.tier ?? 'gemini'] > MINDMAP_TIER_RANK[current.tier ?? 'gemini'];
 }
 
 export interface TranscriptionResult {
@@ -15,7 +30,19 @@ export interface TranscriptionResult {
   duration?: number;
   segments?: any[];
   timestamp?: string;
-  mindmap?: MindMapData;
+  speech_detected?: boolean;
+  mindmap?: MindMapData | null;
+  mindmap_job_id?: string | null;
+}
+
+export interface MindmapJobResponse {
+  success: boolean;
+  job_id: string;
+  status: 'pending' | 'done' | 'failed' | 'stale';
+  model_used: string;
+  version?: number;
+  mindmap: MindMapData | null;
+  error: string | null;
 }
 
 export interface GeminiRequest {
@@ -29,6 +56,11 @@ export interface GeminiResponse {
   mindmap: MindMapData;
 }
 
+export interface MindmapStreamResult {
+  mindmap: MindMapData;
+  source: 'gemini' | 'cache' | 'fallback';
+}
+
 export interface ModelListResponse {
   models: string[];
 }
@@ -127,6 +159,96 @@ class SpeechToTextAPI {
     }
   }
 
+  // 以 SSE 串流生成架構圖，每收到一行就以目前累積的 Mermaid 代碼呼叫 onUpdate
+  async streamMindmap(
+    text: string,
+    model: string,
+    onUpdate: (mermaidCode: string) => void
+  ): Promise<MindmapStreamResult> {
+    let response: Response;
+    try {
+      response = await fetch(`${API_BASE_URL}/generate-mindmap/stream`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ text, model }),
+      });
+    } catch (error) {
+      throw new Error('網路連接錯誤，請檢查後端服務是否正在運行');
+    }
+
+    if (!response.ok || !response.body) {
+      const apiError = (await response.json().catch(() => ({}))) as Partial<ApiError>;
+      throw new Error(apiError.detail || '架構圖生成失敗');
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let lines: string[] = [];
+
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      // SSE 事件以空行分隔
+      let boundary = buffer.indexOf('\n\n');
+      while (boundary !== -1) {
+        const rawEvent = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+        boundary = buffer.indexOf('\n\n');
+
+        let event = 'message';
+        let data = '';
+        for (const field of rawEvent.split('\n')) {
+          if (field.startsWith('event: ')) event = field.slice(7);
+          else if (field.startsWith('data: ')) data += field.slice(6);
+        }
+        const payload = data ? JSON.parse(data) : {};
+
+        if (event === 'line') {
+          lines = [...lines, payload.line];
+          onUpdate(lines.join('\n'));
+        } else if (event === 'reset') {
+          lines = [];
+        } else if (event === 'done') {
+          return payload as MindmapStreamResult;
+        }
+      }
+    }
+
+    throw new Error('架構圖串流意外中斷');
+  }
+
+  async getMindmapJob(jobId: string, wait: number = 0): Promise<MindmapJobResponse> {
+    try {
+      const response = await axios.get<MindmapJobResponse>(
+        `${API_BASE_URL}/mindmap/${jobId}`,
+        { params: { wait }, timeout: (wait + 10) * 1000 }
+      );
+      return response.data;
+    } catch (error) {
+      if (axios.isAxiosError(error) && error.response) {
+        const apiError = error.response.data as ApiError;
+        throw new Error(apiError.detail || '架構圖查詢失敗');
+      }
+      throw new Error('網路連接錯誤，請檢查後端服務是否正在運行');
+    }
+  }
+
+  async waitForMindmap(jobId: string, maxAttempts: number = 5): Promise<MindMapData | null> {
+    for (let attempt = 0; attempt < maxAttempts; attempt++) {
+      const job = await this.getMindmapJob(jobId, 20);
+      if (job.status === 'done') {
+        return job.mindmap;
+      }
+      if (job.status === 'failed' || job.status === 'stale') {
+        return null;
+      }
+    }
+    return null;
+  }
+
   async healthCheck(): Promise<{ status: string; service: string }> {
     try {
       const response = await this.axiosInstance.get('/health');
@@ -8,9 +8,11 @@ interface MindMapData {
 
 interface MindMapProps {
   data: MindMapData;
+  // 串流生成中：代碼可能尚不完整，渲染失敗時保留上一次的圖
+  streaming?: boolean;
 }
 
-const MindMap: React.FC<MindMapProps> = ({ data }) => {
+const MindMap: React.FC<MindMapProps> = ({ data, streaming = false }) => {
   const mermaidRef = useRef<HTMLDivElement>(null);
 
   useEffect(() => {
@@ -36,8 +38,10 @@ const MindMap: React.FC<MindMapProps> = ({ data }) => {
         }
       });
 
-      // 清空容器
-      mermaidRef.current.innerHTML = '';
+      // 串流中保留上一次的圖，避免每收到一行就閃爍
+      if (!streaming) {
+        mermaidRef.current.innerHTML = '';
+      }
 
       // 生成唯一的 ID
       const id = `mermaid-${Date.now()}-${Math.random().toString(36).substr(2, 9)}`;
@@ -48,6 +52,7 @@ const MindMap: React.FC<MindMapProps> = ({ data }) => {
           mermaidRef.current.innerHTML = result.svg;
         }
       }).catch((error) => {
+        if (streaming) return;
         console.error('架構圖渲染錯誤:', error);
         if (mermaidRef.current) {
           mermaidRef.current.innerHTML = `
@@ -59,7 +64,7 @@ const MindMap: React.FC<MindMapProps> = ({ data }) => {
         }
       });
     }
-  }, [data]);
+  }, [data, streaming]);
 
   if (!data || !data.mermaid_code) {
     return (